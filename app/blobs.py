@@ -0,0 +1,111 @@
+import importlib
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Directory of the filesystem blob store used for uploaded files
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "./blobs")
+# Optional replacement for the filesystem store, as "package.module:factory"
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "")
+
+# Bytes read from a stored blob per chunk when it is downloaded
+BLOB_READ_CHUNK_BYTES = 64 * 1024
+
+class BlobStore(ABC):
+    """
+    Interface for the storage of uploaded files (e.g. a local directory or an object store).
+
+    Keys are "/"-separated relative paths chosen by the service. Blobs are written once and
+    never modified.
+    """
+
+    @abstractmethod
+    async def save(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        """
+        Stores the chunks under key as they arrive and returns the number of bytes written.
+
+        If the iterator raises, nothing is left under key and the exception propagates.
+        """
+
+    @abstractmethod
+    async def open(self, key: str) -> Optional[AsyncIterator[bytes]]:
+        """
+        Returns the blob's content as an iterator of chunks, or None if there is no such blob.
+        """
+
+class FilesystemBlobStore(BlobStore):
+    """
+    Stores blobs as files under a root directory.
+
+    A blob is streamed into a temporary file next to its destination and renamed into place once
+    complete, so readers never see a partial file.
+    """
+
+    def __init__(self, root: str = BLOB_STORE_PATH):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, *key.split("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Blob key {key!r} escapes the store")
+        return path
+
+    async def save(self, key: str, chunks: AsyncIterator[bytes]) -> int:
+        path = self._path(key)
+        partial = f"{path}.part"
+        await run_in_threadpool(os.makedirs, os.path.dirname(path), exist_ok=True)
+        f = await run_in_threadpool(open, partial, "wb")
+        size = 0
+        try:
+            async for chunk in chunks:
+                await run_in_threadpool(f.write, chunk)
+                size += len(chunk)
+            await run_in_threadpool(f.flush)
+            await run_in_threadpool(os.fsync, f.fileno())
+        except BaseException:
+            f.close()
+            await run_in_threadpool(os.remove, partial)
+            raise
+        f.close()
+        await run_in_threadpool(os.replace, partial, path)
+        return size
+
+    async def open(self, key: str) -> Optional[AsyncIterator[bytes]]:
+        try:
+            f = await run_in_threadpool(open, self._path(key), "rb")
+        except (FileNotFoundError, ValueError):
+            return None
+
+        async def read_chunks() -> AsyncIterator[bytes]:
+            try:
+                while True:
+                    chunk = await run_in_threadpool(f.read, BLOB_READ_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                f.close()
+        return read_chunks()
+
+def load_blob_store(spec: str) -> BlobStore:
+    """
+    Instantiates the blob store from a "package.module:factory" spec, or the filesystem store for an empty spec.
+
+    Raises:
+        ImportError: If the module cannot be imported.
+        AttributeError: If the factory does not exist.
+    """
+    if not spec:
+        return FilesystemBlobStore()
+    module_name, _, attribute = spec.partition(":")
+    store = getattr(importlib.import_module(module_name), attribute)()
+    logger.info("event=blobs.backend_loaded backend=%s", type(store).__name__)
+    return store
+
+# Process-wide blob store
+blob_store = load_blob_store(BLOB_STORE_BACKEND)
@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import Index, String, Table, inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.database import (
+    engine, metadata, USE_ASYNC_DB, run_ddl, get_dynamic_table, get_filter_indexes, create_partitions,
+    declares_jsonb, ensured_tables, json_data_tables, uncompacted_tables, COLUMN_MIGRATIONS
+)
+from app.registry import ConfigRegistry, registry
+from app.stats import stats_table, summary_enabled
+
+logger = logging.getLogger(__name__)
+
+# Create missing tables and indexes at startup; turn off when `python -m app.bootstrap` runs before the workers
+SCHEMA_BOOTSTRAP = os.getenv("SCHEMA_BOOTSTRAP", "true").lower() in ("1", "true", "yes")
+
+# Key of the PostgreSQL advisory lock held while the schema is bootstrapped (any fixed bigint)
+SCHEMA_LOCK_KEY = 0x666F726D5F736368
+
+def _log_pending_migrations(table: Table, columns: List[Dict[str, Any]]) -> bool:
+    """
+    Logs an error for each migration an existing table still needs, given its reflected columns.
+
+    Returns:
+        True if the table's data column is still JSON where it should be JSONB.
+    """
+    existing = {column["name"]: column for column in columns}
+    submission_id = existing.get("submission_id")
+    if submission_id is not None and isinstance(submission_id["type"], String):
+        logger.error("event=table.text_submission_ids table=%s hint=\"run python -m app.migrations submission-ids\"", table.name)
+    data = existing.get("data")
+    json_data = data is not None and "data" in table.c and declares_jsonb(table) and not isinstance(data["type"], JSONB)
+    if json_data:
+        logger.error("event=table.json_data table=%s hint=\"run python -m app.migrations compact-storage\"", table.name)
+    for column in table.columns:
+        if column.name not in existing:
+            logger.error("event=table.missing_column table=%s column=%s hint=\"run python -m app.migrations %s\"",
+                         table.name, column.name, COLUMN_MIGRATIONS.get(column.name, ""))
+    return json_data
+
+def _bootstrap(conn, tables: List[Table], indexes: List[Index]) -> Dict[str, List[str]]:
+    """
+    Creates the missing tables and indexes in one transaction, with one catalog query for each.
+
+    On PostgreSQL a transaction-scoped advisory lock serializes concurrent workers: the first
+    creates the schema, the others wait for it to commit and then find nothing left to do.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+    inspector = inspect(conn)
+    existing = set(inspector.get_table_names())
+    missing = [table for table in tables if table.name not in existing]
+    present = [table for table in tables if table.name in existing]
+
+    if present:
+        by_name = {table.name: table for table in present}
+        for (_, table_name), columns in inspector.get_multi_columns(filter_names=list(by_name)).items():
+            # Requests fall back to the JSON operators on these tables until they are migrated
+            if _log_pending_migrations(by_name[table_name], columns):
+                json_data_tables.add(table_name)
+            else:
+                json_data_tables.discard(table_name)
+            # Reads select data_compressed only where it exists
+            if any(column["name"] == "data_compressed" for column in columns):
+                uncompacted_tables.discard(table_name)
+            else:
+                uncompacted_tables.add(table_name)
+
+    # Existence is already known, so create_all need not check each table again
+    if missing:
+        metadata.create_all(bind=conn, tables=missing, checkfirst=False)
+        for table in missing:
+            create_partitions(conn, table)
+
+    created_indexes = []
+    if indexes:
+        # Indexes of the tables just created were created with them
+        existing_indexes = set(conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()"
+        )).scalars())
+        for index in indexes:
+            # A GIN index with jsonb_path_ops cannot be built on a JSON column
+            if index.table.name in json_data_tables and index.dialect_options["postgresql"]["using"] == "gin":
+                continue
+            if index.name not in existing_indexes:
+                index.create(bind=conn)
+                created_indexes.append(index.name)
+    return {"tables": [table.name for table in missing], "indexes": created_indexes}
+
+async def bootstrap_schema(template_names: Iterable[str], config_registry: ConfigRegistry = registry) -> Dict[str, List[str]]:
+    """
+    Creates whatever the given templates need in the database: their submissions tables, their
+    filter indexes on PostgreSQL and the stats summary table.
+
+    Tables already ensured by this process are skipped, so bootstrapping again after a reload
+    only touches the new templates.
+
+    Args:
+        template_names: The templates whose tables and indexes should exist.
+        config_registry: The registry holding the templates' plans.
+
+    Returns:
+        The names of the tables and indexes that were created.
+    """
+    tables: Dict[str, Table] = {}
+    indexes: Dict[str, Index] = {}
+    for template_name in template_names:
+        table = get_dynamic_table(template_name)
+        tables.setdefault(table.name, table)
+        filterable_types = config_registry.get_plan(template_name).filterable_types
+        if filterable_types and engine.dialect.name == "postgresql":
+            for index in get_filter_indexes(table, template_name, filterable_types):
+                indexes.setdefault(index.name, index)
+    if summary_enabled():
+        tables.setdefault(stats_table.name, stats_table)
+    wanted = [table for name, table in tables.items() if name not in ensured_tables]
+    if not wanted and not indexes:
+        return {"tables": [], "indexes": []}
+
+    start = time.perf_counter()
+    try:
+        created = await run_ddl(_bootstrap, wanted, list(indexes.values()))
+    except Exception as e:
+        logger.error("event=db.bootstrap_failed error=%s", e)
+        raise
+    ensured_tables.update(table.name for table in wanted)
+    logger.info("event=db.bootstrapped tables=%d created_tables=%d created_indexes=%d seconds=%.3f",
+                len(wanted), len(created["tables"]), len(created["indexes"]), time.perf_counter() - start)
+    return created
+
+async def _run(args: argparse.Namespace) -> None:
+    try:
+        await bootstrap_schema(args.template or list(registry.templates_data))
+    finally:
+        if USE_ASYNC_DB:
+            await engine.dispose()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Create the Form Builder database schema before starting the workers")
+    parser.add_argument("--template", action="append", help="Only bootstrap this template (repeatable)")
+    asyncio.run(_run(parser.parse_args(argv)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import importlib
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Memory budget of the per-worker cache of GET /forms/{template}/{form_id} bodies (0 disables it)
+SUBMISSION_CACHE_BYTES = int(os.getenv("SUBMISSION_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Optional shared backend behind the local cache, as "package.module:factory"
+SUBMISSION_CACHE_BACKEND = os.getenv("SUBMISSION_CACHE_BACKEND", "")
+
+# Approximate per-entry bookkeeping (key string, tuple and OrderedDict node) added to the body size
+ENTRY_OVERHEAD_BYTES = 200
+
+class CacheBackend(ABC):
+    """
+    Interface for a cache shared between workers (e.g. Redis or memcached).
+
+    Implementations store opaque bytes under string keys. Entries never change once written, so
+    backends may evict freely but need no invalidation.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the value stored under key, or None if there is none.
+        """
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None:
+        """
+        Stores value under key.
+        """
+
+class InMemoryBackend(CacheBackend):
+    """
+    Unbounded dict-backed stand-in for a shared backend, for tests and local development.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, bytes] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        self.entries[key] = value
+
+class LocalLRUCache:
+    """
+    Thread-safe LRU cache of bytes bounded by total size rather than entry count.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        cost = len(value) + len(key) + ENTRY_OVERHEAD_BYTES
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= len(previous) + len(key) + ENTRY_OVERHEAD_BYTES
+            self._entries[key] = value
+            self.size_bytes += cost
+            while self.size_bytes > self.max_bytes:
+                old_key, old_value = self._entries.popitem(last=False)
+                self.size_bytes -= len(old_value) + len(old_key) + ENTRY_OVERHEAD_BYTES
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SubmissionCache:
+    """
+    Read-through cache of rendered submission responses: a local LRU, optionally backed by a shared backend.
+
+    Keys combine the template name, its plan fingerprint and the submission ID, so a template whose
+    output components change never serves bodies rendered for the old configuration.
+    """
+
+    def __init__(self, max_bytes: int = SUBMISSION_CACHE_BYTES, backend: Optional[CacheBackend] = None):
+        self.local = LocalLRUCache(max_bytes) if max_bytes > 0 else None
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.local is not None or self.backend is not None
+
+    @staticmethod
+    def key(template_name: str, fingerprint: str, submission_id: str) -> str:
+        return f"{template_name}:{fingerprint}:{submission_id}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns a cached body from the local cache, then the shared backend, counting hits and misses.
+        """
+        value = self.local.get(key) if self.local is not None else None
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+            return value
+        if self.backend is not None:
+            try:
+                value = await self.backend.get(key)
+            except Exception as e:
+                logger.warning("event=cache.backend_get_failed error=%s", e)
+            if value is not None:
+                if self.local is not None:
+                    self.local.set(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def set(self, key: str, value: bytes) -> None:
+        """
+        Stores a body locally and in the shared backend; backend failures are logged, not raised.
+        """
+        if self.local is not None:
+            self.local.set(key, value)
+        if self.backend is not None:
+            try:
+                await self.backend.set(key, value)
+            except Exception as e:
+                logger.warning("event=cache.backend_set_failed error=%s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns hit/miss counters and the local cache's occupancy for this worker.
+        """
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "backend": type(self.backend).__name__ if self.backend is not None else None,
+                "entries": len(self.local) if self.local is not None else 0,
+                "size_bytes": self.local.size_bytes if self.local is not None else 0,
+                "max_bytes": self.local.max_bytes if self.local is not None else 0,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+def load_backend(spec: str) -> Optional[CacheBackend]:
+    """
+    Instantiates a shared backend from a "package.module:factory" spec, or returns None for an empty spec.
+
+    Raises:
+        ImportError: If the module cannot be imported.
+        AttributeError: If the factory does not exist.
+    """
+    if not spec:
+        return None
+    module_name, _, attribute = spec.partition(":")
+    factory = getattr(importlib.import_module(module_name), attribute)
+    backend = factory()
+    logger.info("event=cache.backend_loaded backend=%s", type(backend).__name__)
+    return backend
+
+# Process-wide submission cache
+submission_cache = SubmissionCache(backend=load_backend(SUBMISSION_CACHE_BACKEND))
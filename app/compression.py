@@ -0,0 +1,120 @@
+import json
+import os
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Table
+
+from app.database import has_compressed_data
+from app.plans import SubmissionPlan
+from app.responses import dumps
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - exercised only when zstandard is not installed
+    zstandard = None
+
+# Codec for large submissions, "zlib" or "zstd" (needs zstandard); empty stores every submission as plain JSON
+DATA_COMPRESSION = os.getenv("DATA_COMPRESSION", "").lower()
+# Submissions whose JSON is at least this many bytes have their non-queryable components compressed
+DATA_COMPRESSION_MIN_BYTES = int(os.getenv("DATA_COMPRESSION_MIN_BYTES", "4096"))
+
+# Leading bytes of a zstd frame; zlib streams never start with them
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+if DATA_COMPRESSION not in ("", "zlib", "zstd"):
+    raise ValueError(f"DATA_COMPRESSION must be zlib or zstd, not {DATA_COMPRESSION!r}")
+if DATA_COMPRESSION == "zstd" and zstandard is None:
+    raise ImportError("DATA_COMPRESSION=zstd requires the zstandard package")
+
+def compression_enabled() -> bool:
+    """
+    Returns True if submissions may have a data_compressed column to read and write.
+    """
+    return bool(DATA_COMPRESSION)
+
+def compress(payload: bytes) -> bytes:
+    """
+    Compresses bytes with the configured codec.
+    """
+    if DATA_COMPRESSION == "zstd":
+        return zstandard.ZstdCompressor().compress(payload)
+    return zlib.compress(payload)
+
+def decompress(blob: bytes) -> bytes:
+    """
+    Decompresses bytes written by compress, with whichever codec wrote them.
+    """
+    blob = bytes(blob)
+    if blob[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ImportError("Submission data is zstd-compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+def compact_data(plan: SubmissionPlan, data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """
+    Splits submission data into the JSON to store in the data column and an optional compressed blob.
+
+    Only submissions of at least DATA_COMPRESSION_MIN_BYTES are split. Their filterable and
+    aggregated components stay in the data column, where filters, stats scans and indexes read
+    them; the rest (typically long free text and arrays) is compressed. A blob that would not be
+    smaller than its JSON is not stored.
+
+    Args:
+        plan: The template's compiled submission plan.
+        data: The submission data ({componentID: value}).
+
+    Returns:
+        The data column value and the data_compressed column value (None if nothing was compressed).
+    """
+    if not DATA_COMPRESSION:
+        return data, None
+    payload = dumps(data)
+    if len(payload) < DATA_COMPRESSION_MIN_BYTES:
+        return data, None
+    queryable_ids = plan.queryable_ids
+    offloaded = {component_id: value for component_id, value in data.items() if component_id not in queryable_ids}
+    if not offloaded:
+        return data, None
+    raw = dumps(offloaded)
+    blob = compress(raw)
+    if len(blob) >= len(raw):
+        return data, None
+    return {component_id: value for component_id, value in data.items() if component_id in queryable_ids}, blob
+
+def stored_values(plan: SubmissionPlan, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns the data column values of a row to insert for a template's submission.
+
+    Every row gets the same keys, so rows of one template can be inserted with executemany.
+    """
+    if not DATA_COMPRESSION:
+        return {"data": data}
+    stored, blob = compact_data(plan, data)
+    return {"data": stored, "data_compressed": blob}
+
+def expand_data(data: Optional[Dict[str, Any]], blob: Optional[bytes]) -> Dict[str, Any]:
+    """
+    Merges the compressed components of a stored submission back into its data column value.
+    """
+    if blob is None:
+        return data
+    return {**(data or {}), **json.loads(decompress(blob))}
+
+def data_columns(table: Table) -> List[Any]:
+    """
+    Returns the columns to select for a submission's data, to be read back with row_data.
+
+    data_compressed is selected whenever the table has it, so rows compressed earlier still read
+    back whole after DATA_COMPRESSION is unset.
+    """
+    if has_compressed_data(table):
+        return [table.c.data, table.c.data_compressed]
+    return [table.c.data]
+
+def row_data(row) -> Dict[str, Any]:
+    """
+    Returns the full submission data of a row selected with data_columns.
+    """
+    return expand_data(row.data, row._mapping.get("data_compressed"))
@@ -1,47 +1,203 @@
+import hashlib
 import logging
 import os
-import json
-from typing import Dict, Any
-from sqlalchemy import create_engine, Column, Integer, String, JSON, MetaData, Table, inspect
+import uuid
+from typing import Dict, Any, Callable, List
+from sqlalchemy import create_engine, Column, Integer, String, JSON, LargeBinary, MetaData, Table, Index, PrimaryKeyConstraint, UniqueConstraint, inspect, literal, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.types import TypeDecorator
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
+from app.log import configure_logging
+from app.pool import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, describe_pool
+
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Get database URL from environment variables
+# Get database URL and connection pool settings from environment variables
 DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+
+# "per_template" stores each template in its own table; "shared" stores every template in one table
+STORAGE_LAYOUT = os.getenv("STORAGE_LAYOUT", "per_template").lower()
+# Hash partitions of the shared table on PostgreSQL (0 leaves it unpartitioned)
+SUBMISSIONS_PARTITIONS = int(os.getenv("SUBMISSIONS_PARTITIONS", "16"))
+
+SHARED_TABLE_NAME = "submissions"
+
+# Type of the data column: JSONB on PostgreSQL, so it is parsed once on write and can be indexed; JSON elsewhere
+SubmissionData = JSON().with_variant(JSONB(), "postgresql")
+
+def is_async_database_url(database_url: str) -> bool:
+    """
+    Returns True if the URL selects an asyncio driver (e.g. postgresql+asyncpg, sqlite+aiosqlite).
+    """
+    return make_url(database_url).get_dialect().is_async
 
-# Create SQLAlchemy engine and session
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def get_engine_options(database_url: str, use_async: bool) -> Dict[str, Any]:
+    """
+    Builds the engine keyword arguments for the configured connection pool.
+    
+    In-memory SQLite keeps SQLAlchemy's default single-connection pool, which takes no sizing options.
+    """
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=InstrumentedAsyncAdaptedQueuePool if use_async else InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return options
+
+USE_ASYNC_DB = is_async_database_url(DATABASE_URL)
+
+# Create SQLAlchemy engine and session, async or sync depending on the URL scheme
+if USE_ASYNC_DB:
+    engine = create_async_engine(DATABASE_URL, **get_engine_options(DATABASE_URL, True))
+    SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+else:
+    engine = create_engine(DATABASE_URL, **get_engine_options(DATABASE_URL, False))
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 metadata = MetaData()
 
 # Dictionary to store dynamic models
 dynamic_tables = {}
 
-def get_db():
+# Dictionary to store expression indexes on dynamic tables, keyed by index name
+filter_indexes: Dict[str, Index] = {}
+
+# Tables known to exist in the database, so later bootstraps (e.g. on reload) skip them
+ensured_tables = set()
+
+# Tables the bootstrap found with a JSON data column on PostgreSQL (not yet migrated to JSONB)
+json_data_tables = set()
+
+# Tables the bootstrap found without a data_compressed column (created before compact storage)
+uncompacted_tables = set()
+
+# SQL casts applied to scalar component values when filtering, keyed by output type
+SCALAR_VALUE_CASTS = {"string": "string", "number": "float", "boolean": "boolean", "bool": "boolean"}
+
+def get_pool_status() -> Dict[str, Any]:
+    """
+    Returns the configuration and current occupancy of the engine's connection pool.
+    """
+    status = describe_pool(engine.pool)
+    status["configured"] = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    return status
+
+async def get_db():
     """
     Dependency for FastAPI to get a database session.
     
     Yields:
-        A database session that is automatically closed when the request is complete.
+        An AsyncSession when an async driver is configured, otherwise a Session.
+        Either way the session is closed when the request is complete.
     """
+    if USE_ASYNC_DB:
+        async with SessionLocal() as db:
+            yield db
+        return
+
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
 
-def create_dynamic_table(template_name: str):
+async def run_db(db, fn: Callable, *args, **kwargs):
     """
-    Creates a dynamic SQLAlchemy table for a template.
+    Runs a synchronous unit of database work without blocking the event loop.
+    
+    Args:
+        db: The session yielded by get_db.
+        fn: A callable taking a synchronous Session as its first argument.
+        
+    Returns:
+        The return value of fn.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def run_in_transaction(fn: Callable, *args, **kwargs):
+    """
+    Runs a synchronous callable against a connection of its own inside a transaction.
+    
+    Unlike run_db this does not need a request's session, so background tasks can use it.
+    
+    Args:
+        fn: A callable taking a synchronous Connection as its first argument.
+        
+    Returns:
+        The return value of fn.
+    """
+    if USE_ASYNC_DB:
+        async with engine.begin() as conn:
+            return await conn.run_sync(fn, *args, **kwargs)
+
+    def _run():
+        with engine.begin() as conn:
+            return fn(conn, *args, **kwargs)
+    return await run_in_threadpool(_run)
+
+# DDL runs the same way: one connection, one transaction
+run_ddl = run_in_transaction
+
+class CompactUUID(TypeDecorator):
+    """
+    UUID column stored natively on PostgreSQL and as 16 raw bytes elsewhere.
+    
+    Values are bound and returned as uuid.UUID; strings are accepted on bind.
+    """
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(PG_UUID(as_uuid=True))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value if dialect.name == "postgresql" else value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(bytes=bytes(value))
+
+def get_dynamic_table(template_name: str) -> Table:
+    """
+    Returns the SQLAlchemy table for a template, defining it on first use.
+    
+    This does not touch the database; see create_dynamic_table.
     
     Args:
         template_name: The name of the template.
@@ -49,6 +205,9 @@ def create_dynamic_table(template_name: str):
     Returns:
         A SQLAlchemy Table object for the template.
     """
+    if STORAGE_LAYOUT == "shared":
+        return get_shared_table()
+    
     # Create a table name from the template name
     table_name = f"{template_name.lower()}_submissions"
     
@@ -56,43 +215,214 @@ def create_dynamic_table(template_name: str):
     if table_name in dynamic_tables:
         return dynamic_tables[table_name]
     
-    logger.info(f"Creating dynamic table: {table_name}")
-    
-    # Create a table
-    table = Table(
-        table_name,
-        metadata,
+    # Create a table and store it in our dictionary
+    table = define_template_table(template_name, metadata)
+    dynamic_tables[table_name] = table
+    return table
+
+def define_template_table(template_name: str, table_metadata: MetaData) -> Table:
+    """
+    Defines the per-template submissions table of a template on the given metadata.
+    """
+    return Table(
+        f"{template_name.lower()}_submissions",
+        table_metadata,
         Column('id', Integer, primary_key=True, index=True),
-        Column('submission_id', String, unique=True, index=True),
-        Column('data', JSON),
+        Column('submission_id', CompactUUID, unique=True, index=True),
+        Column('data', SubmissionData),
+        Column('data_compressed', LargeBinary, nullable=True),
+        Column('idempotency_key', String(255), unique=True, index=True),
         extend_existing=True
     )
+
+def get_shared_table() -> Table:
+    """
+    Returns the table holding the submissions of every template, defining it on first use.
     
-    # Store the table in our dictionary
-    dynamic_tables[table_name] = table
-    
-    # Create the table if it doesn't exist
-    inspector = inspect(engine)
-    if not inspector.has_table(table_name):
-        table.create(bind=engine)
-        logger.info(f"Created table: {table_name}")
+    Rows are keyed by (template, id). On PostgreSQL the table is hash-partitioned by template, so
+    the primary key and unique constraints all start with template. SQLite cannot autoincrement a
+    composite key, so there id alone is the primary key and (template, id) gets its own index.
+    """
+    if SHARED_TABLE_NAME in dynamic_tables:
+        return dynamic_tables[SHARED_TABLE_NAME]
     
+    if engine.dialect.name == "postgresql":
+        key_columns = [
+            Column('template', String(255), nullable=False),
+            Column('id', Integer, autoincrement=True, nullable=False),
+            # Declared explicitly so template leads the key and keyset pages read one index range
+            PrimaryKeyConstraint('template', 'id', name=f"pk_{SHARED_TABLE_NAME}"),
+        ]
+        options = {"postgresql_partition_by": "HASH (template)"} if SUBMISSIONS_PARTITIONS > 0 else {}
+    else:
+        key_columns = [
+            Column('id', Integer, primary_key=True),
+            Column('template', String(255), nullable=False),
+        ]
+        options = {}
+    table = Table(
+        SHARED_TABLE_NAME,
+        metadata,
+        *key_columns,
+        Column('submission_id', CompactUUID, nullable=False),
+        Column('data', SubmissionData),
+        Column('data_compressed', LargeBinary, nullable=True),
+        Column('idempotency_key', String(255)),
+        UniqueConstraint('template', 'submission_id', name=f"uq_{SHARED_TABLE_NAME}_template_submission_id"),
+        UniqueConstraint('template', 'idempotency_key', name=f"uq_{SHARED_TABLE_NAME}_template_idempotency_key"),
+        extend_existing=True,
+        **options
+    )
+    if engine.dialect.name != "postgresql":
+        Index(f"ix_{SHARED_TABLE_NAME}_template_id", table.c.template, table.c.id)
+    dynamic_tables[SHARED_TABLE_NAME] = table
     return table
 
-def initialize_db():
+def template_clauses(table: Table, template_name: str) -> List[Any]:
     """
-    Initializes the database by creating all tables.
+    Returns the WHERE clauses restricting a submissions table to one template's rows.
+    
+    Per-template tables need none. On PostgreSQL the name is rendered inline so partitions are
+    pruned and the partial filter indexes match.
     """
-    try:
-        # Load templates from templates.json
-        with open("templates.json", "r") as f:
-            templates_data = json.load(f)
+    if "template" not in table.c:
+        return []
+    value = literal(template_name, literal_execute=True) if engine.dialect.name == "postgresql" else template_name
+    return [table.c.template == value]
+
+def template_values(table: Table, template_name: str) -> Dict[str, Any]:
+    """
+    Returns the extra column values a row of the given template needs in a submissions table.
+    """
+    return {"template": template_name} if "template" in table.c else {}
+
+def json_value(table: Table, component_id: str, output_type: str):
+    """
+    Returns a typed SQL expression for a component's value inside a table's data column.
+    
+    On PostgreSQL the key is rendered inline so the expression matches the expression
+    indexes defined by get_filter_indexes (and created by app.bootstrap).
+    
+    Args:
+        table: The template's submissions table.
+        component_id: The componentID to extract.
+        output_type: The component's output type.
         
-        # Create tables for each template
-        for template_name in templates_data.keys():
-            create_dynamic_table(template_name)
+    Returns:
+        The SQL expression, or None if the output type is not a scalar.
+    """
+    cast = SCALAR_VALUE_CASTS.get(output_type)
+    if cast is None:
+        return None
+    key = literal(component_id, literal_execute=True) if engine.dialect.name == "postgresql" else component_id
+    element = table.c.data[key]
+    if cast == "float":
+        return element.as_float()
+    if cast == "boolean":
+        return element.as_boolean()
+    return element.as_string()
+
+def declares_jsonb(table: Table) -> bool:
+    """
+    Returns True if the table's data column is declared as JSONB on the connected database.
+    """
+    return isinstance(table.c.data.type.dialect_impl(engine.dialect), JSONB)
+
+def data_is_jsonb(table: Table) -> bool:
+    """
+    Returns True if the table's data column is stored as JSONB on the connected database.
+
+    Tables created before the column became JSONB keep JSON until python -m app.migrations
+    compact-storage converts them; the bootstrap records those in json_data_tables.
+    """
+    return table.name not in json_data_tables and declares_jsonb(table)
+
+def has_compressed_data(table: Table) -> bool:
+    """
+    Returns True if the table has a data_compressed column to read, whatever DATA_COMPRESSION is set to.
+    """
+    return "data_compressed" in table.c and table.name not in uncompacted_tables
+
+def _index_name(table_name: str, suffix: str) -> str:
+    """
+    Builds an index name that fits PostgreSQL's 63 character identifier limit.
+    """
+    name = f"ix_{table_name}_{suffix}"
+    if len(name) > 63:
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:10]
+        name = f"{name[:52]}_{digest}"
+    return name
+
+def get_filter_indexes(table: Table, template_name: str, filterable_types: Dict[str, str]) -> List[Index]:
+    """
+    Returns the indexes backing submission filters on a table, defining them on first use.
+    
+    Every filterable scalar component gets a B-tree expression index on its typed value, and a
+    JSONB data column additionally gets a GIN index for containment (equality) filters. On the
+    shared table the expression indexes are partial, covering only the template's rows.
+    
+    Args:
+        table: The template's submissions table.
+        template_name: The name of the template.
+        filterable_types: Output types of the filterable components, keyed by componentID.
         
-        logger.info("Database initialized")
-    except Exception as e:
-        logger.error(f"Error initializing database: {str(e)}")
-        raise 
\ No newline at end of file
+    Returns:
+        The Index objects.
+    """
+    indexes = []
+    clauses = template_clauses(table, template_name)
+    prefix = f"{template_name.lower()}_" if clauses else ""
+    wanted = [(component_id, json_value(table, component_id, output_type))
+              for component_id, output_type in filterable_types.items()]
+    wanted = [(_index_name(table.name, prefix + component_id), expression) for component_id, expression in wanted if expression is not None]
+    if filterable_types and data_is_jsonb(table):
+        wanted.append((_index_name(table.name, "data_gin"), table.c.data))
+    for name, expression in wanted:
+        index = filter_indexes.get(name)
+        if index is None:
+            if expression is table.c.data:
+                index = Index(name, expression, postgresql_using="gin", postgresql_ops={"data": "jsonb_path_ops"})
+            elif clauses:
+                index = Index(name, expression, postgresql_where=table.c.template == template_name)
+            else:
+                index = Index(name, expression)
+            filter_indexes[name] = index
+        indexes.append(index)
+    return indexes
+
+def has_text_submission_ids(conn, table_name: str) -> bool:
+    """
+    Returns True if an existing table still stores submission_id as text (before the UUID migration).
+    """
+    for column in inspect(conn).get_columns(table_name):
+        if column["name"] == "submission_id":
+            return isinstance(column["type"], String)
+    return False
+
+def missing_columns(conn, table: Table) -> List[str]:
+    """
+    Returns the names of the table's columns that the existing database table lacks.
+    """
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    return [column.name for column in table.columns if column.name not in existing]
+
+# Migration that adds each column to tables created before it existed
+COLUMN_MIGRATIONS = {"idempotency_key": "idempotency-keys", "data_compressed": "compact-storage", "shard": "stats"}
+
+def create_partitions(conn, table: Table) -> None:
+    """
+    Creates the hash partitions of a partitioned shared table; other tables have none.
+    """
+    if table.dialect_options["postgresql"]["partition_by"]:
+        for remainder in range(SUBMISSIONS_PARTITIONS):
+            conn.execute(text(
+                f"CREATE TABLE {table.name}_p{remainder} PARTITION OF {table.name} "
+                f"FOR VALUES WITH (MODULUS {SUBMISSIONS_PARTITIONS}, REMAINDER {remainder})"
+            ))
+
+def create_submissions_table(conn, table: Table) -> None:
+    """
+    Creates a submissions table, and the hash partitions of a partitioned shared table.
+    """
+    table.create(bind=conn)
+    create_partitions(conn, table)
\ No newline at end of file
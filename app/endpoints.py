@@ -1,18 +1,567 @@
+import json
 import logging
+import operator
+import os
+import time
 import uuid
-from typing import Dict, Any, Callable
-from fastapi import Depends, Path, HTTPException
-from pydantic import BaseModel
+from typing import Dict, Any, Callable, List, AsyncIterator, Literal, Optional
+from fastapi import Depends, Header, Path, Query, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
 from sqlalchemy.orm import Session
-from sqlalchemy import text, insert, select
+from sqlalchemy import Table, insert, select, type_coerce
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import JSONB
 
-from app.database import get_db, create_dynamic_table
-from app.config import load_config
+from app.database import get_db, get_dynamic_table, run_db, json_value, data_is_jsonb, template_clauses, template_values
+from app.export import export_submissions
+from app.ids import uuid7, parse_submission_id
+from app.idempotency import idempotency_cache, IDEMPOTENCY_KEY_MAX_LENGTH
+from app.plans import SubmissionPlan
+from app.registry import registry
+from app.log import log_payload
+from app.metrics import form_metrics, since_request_start, OperationMetrics
+from app.responses import FastJSONResponse, dumps
+from app.cache import submission_cache, SubmissionCache
+from app.compression import compression_enabled, data_columns, row_data, stored_values
+from app.stats import record_submissions, read_summary, scan_stats, summary_enabled
+from app.write_behind import write_behind, WriteBehindFull
 
 logger = logging.getLogger(__name__)
 
-# Load templates data
-templates_data = load_config("templates.json")
+# Maximum number of forms accepted by a single batch submission
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Page sizes for submission listings
+LIST_DEFAULT_LIMIT = int(os.getenv("LIST_DEFAULT_LIMIT", "50"))
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "500"))
+
+# Comparison operators accepted in "componentID:op:value" filters
+FILTER_OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+}
+
+def _execute_and_commit(db: Session, statement, parameters=None, timings: Optional[OperationMetrics] = None,
+                        submissions: Optional[List[Any]] = None) -> None:
+    """
+    Executes a statement and commits, recording the db_execute and commit stages when timings are given.
+    
+    Inserted (plan, data) pairs passed as submissions are added to the stats summaries
+    in the same transaction.
+    """
+    start = time.perf_counter()
+    db.execute(statement, parameters)
+    if submissions:
+        record_submissions(db, submissions)
+    executed = time.perf_counter()
+    db.commit()
+    if timings is not None:
+        timings.observe_stage("db_execute", executed - start)
+        timings.observe_stage("commit", time.perf_counter() - executed)
+
+def _insert_submission(db: Session, table, plan: SubmissionPlan, submission_id: uuid.UUID, data: Dict[str, Any],
+                       idempotency_key: Optional[str] = None, timings: Optional[OperationMetrics] = None) -> None:
+    """
+    Inserts a single submission and commits it.
+    """
+    template_name = plan.template_name
+    values = {"submission_id": submission_id, **stored_values(plan, data), **template_values(table, template_name)}
+    if idempotency_key is not None:
+        values["idempotency_key"] = idempotency_key
+    _execute_and_commit(db, insert(table).values(**values), timings=timings, submissions=[(plan, data)])
+
+def _insert_submissions(db: Session, table, plan: SubmissionPlan, rows: List[Dict[str, Any]],
+                        timings: Optional[OperationMetrics] = None) -> None:
+    """
+    Inserts many submissions with a single executemany statement in one transaction.
+    """
+    stored_rows = [{**row, **stored_values(plan, row["data"])} for row in rows]
+    _execute_and_commit(db, insert(table), stored_rows, timings, [(plan, row["data"]) for row in rows])
+
+async def _timed_db(timings: OperationMetrics, db, fn: Callable, *args):
+    """
+    Runs a read through run_db, recording it as the db_execute stage.
+    """
+    start = time.perf_counter()
+    result = await run_db(db, fn, *args)
+    timings.observe_stage("db_execute", time.perf_counter() - start)
+    return result
+
+def _timed_response(timings: OperationMetrics, content: Any, headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+    """
+    Renders a JSON response, recording the time spent serializing it as the serialization stage.
+    """
+    start = time.perf_counter()
+    response = FastJSONResponse(content, headers=headers)
+    timings.observe_stage("serialization", time.perf_counter() - start)
+    return response
+
+def _fetch_submission_data(db: Session, table, template_name: str, submission_id: uuid.UUID):
+    """
+    Returns the stored data for a submission, or None if it does not exist.
+    """
+    stmt = select(*data_columns(table)).where(table.c.submission_id == submission_id, *template_clauses(table, template_name))
+    row = db.execute(stmt).fetchone()
+    return row_data(row) if row else None
+
+def _fetch_by_idempotency_key(db: Session, table, template_name: str, idempotency_key: str):
+    """
+    Returns the submission_id and data stored under an idempotency key, or None.
+    """
+    stmt = select(table.c.submission_id, *data_columns(table)).where(
+        table.c.idempotency_key == idempotency_key, *template_clauses(table, template_name)
+    )
+    return db.execute(stmt).fetchone()
+
+def _fetch_submission_page(db: Session, table, clauses: List[Any], after: Optional[int], limit: int):
+    """
+    Returns up to limit + 1 rows after the given id, in id order, matching all clauses.
+    """
+    stmt = select(table.c.id, table.c.submission_id, *data_columns(table))
+    if after is not None:
+        stmt = stmt.where(table.c.id > after)
+    for clause in clauses:
+        stmt = stmt.where(clause)
+    stmt = stmt.order_by(table.c.id).limit(limit + 1)
+    return db.execute(stmt).fetchall()
+
+def _parse_filter_value(output_type: str, raw: str):
+    """
+    Converts a filter value from the query string to the component's output type.
+    """
+    if output_type == "number":
+        return float(raw)
+    if output_type in ("boolean", "bool"):
+        lowered = raw.lower()
+        if lowered not in ("true", "false"):
+            raise ValueError(f"expected true or false, got {raw!r}")
+        return lowered == "true"
+    return raw
+
+def build_filter_clauses(plan: SubmissionPlan, table: Table, filters: List[str]) -> List[Any]:
+    """
+    Compiles "componentID:op:value" filters into SQL clauses over the data column.
+    
+    Args:
+        plan: The template's compiled submission plan.
+        table: The template's submissions table.
+        filters: The raw filter strings from the query string.
+        
+    Returns:
+        The SQL clauses to AND together, starting with the template's scope on the shared table.
+        
+    Raises:
+        HTTPException: If a filter is malformed, targets a non-scalar component, or (with compression
+            on) targets a component that may be compressed.
+    """
+    clauses = template_clauses(table, plan.template_name)
+    jsonb = data_is_jsonb(table)
+    for raw_filter in filters:
+        parts = raw_filter.split(":", 2)
+        if len(parts) != 3 or parts[1] not in FILTER_OPERATORS:
+            raise HTTPException(status_code=400, detail=f"Invalid filter '{raw_filter}'; expected componentID:op:value with op in {', '.join(FILTER_OPERATORS)}")
+        component_id, op, raw_value = parts
+        component = plan.components_by_id.get(component_id)
+        if component is None:
+            raise HTTPException(status_code=400, detail=f"Unknown component '{component_id}' in filter")
+        expression = json_value(table, component_id, component.output_type)
+        if expression is None:
+            raise HTTPException(status_code=400, detail=f"Component '{component_id}' of type {component.output_type} cannot be filtered")
+        if compression_enabled() and component_id not in plan.queryable_ids:
+            # Large submissions keep only queryable components in data, so SQL would miss the others
+            raise HTTPException(status_code=400, detail=f"Component '{component_id}' is not filterable; mark it \"filterable\": true to filter on it")
+        try:
+            value = _parse_filter_value(component.output_type, raw_value)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid value in filter '{raw_filter}': {str(e)}")
+        if op == "eq" and jsonb:
+            # Containment is served by the GIN index on JSONB data
+            clauses.append(type_coerce(table.c.data, JSONB).contains({component_id: value}))
+        else:
+            clauses.append(FILTER_OPERATORS[op](expression, value))
+    return clauses
+
+async def list_submissions(template_name: str, plan: SubmissionPlan, table: Table, after: Optional[int],
+                           limit: int, filters: List[str], db) -> FastJSONResponse:
+    """
+    Lists submissions with keyset pagination on id, optionally filtered on component values.
+    
+    Args:
+        template_name: The name of the template.
+        plan: The template's compiled submission plan.
+        table: The template's submissions table.
+        after: The cursor returned by the previous page, if any.
+        limit: The maximum number of submissions to return.
+        filters: Filters of the form componentID:op:value.
+        db: The database session (sync or async, see app.database.get_db).
+        
+    Returns:
+        A response with the page of submissions and the cursor for the next page.
+    """
+    timings = form_metrics.operation(template_name, "list")
+    clauses = build_filter_clauses(plan, table, filters)
+    try:
+        rows = await _timed_db(timings, db, _fetch_submission_page, table, clauses, after, limit)
+    except Exception as e:
+        logger.error("event=form.list_failed template=%s error=%s", template_name, e)
+        form_metrics.template(template_name).record_error(e)
+        raise HTTPException(status_code=500, detail=f"Error listing submissions: {str(e)}")
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return _timed_response(timings, {
+        "message": f"Listed {template_name} forms",
+        "items": [
+            {"submission_id": str(row.submission_id), "data": plan.project_stored(row_data(row))}
+            for row in rows
+        ],
+        "next_cursor": rows[-1].id if has_more else None
+    })
+
+async def load_stats(template_name: str, plan: SubmissionPlan, table: Table, source: Optional[str],
+                     filters: List[str], db) -> FastJSONResponse:
+    """
+    Computes per-component aggregates of a template's submissions.
+    
+    Option counts are returned for string and string[] components, count, min, max, mean and
+    (with minValue and maxValue) a histogram for numbers, and true/false counts for booleans.
+    
+    Args:
+        template_name: The name of the template.
+        plan: The template's compiled submission plan.
+        table: The template's submissions table.
+        source: "summary" to read the incrementally maintained summary table, "scan" to aggregate
+            the stored submissions in SQL, or None for the summary when it can answer.
+        filters: Filters of the form componentID:op:value; they need a scan.
+        db: The database session (sync or async, see app.database.get_db).
+        
+    Returns:
+        A response with the submission count and the stats of each aggregated component.
+    """
+    if source is None:
+        source = "summary" if summary_enabled() and plan.stats_components and not filters else "scan"
+    elif source == "summary" and filters:
+        raise HTTPException(status_code=400, detail="Filters are only supported with source=scan")
+    elif source == "summary" and not summary_enabled():
+        raise HTTPException(status_code=400, detail="Stats summaries are disabled; use source=scan")
+    timings = form_metrics.operation(template_name, "stats")
+    clauses = build_filter_clauses(plan, table, filters) if source == "scan" else None
+    try:
+        if source == "summary":
+            count, components = await _timed_db(timings, db, read_summary, plan)
+        else:
+            count, components = await _timed_db(timings, db, scan_stats, plan, table, clauses)
+    except Exception as e:
+        logger.error("event=form.stats_failed template=%s source=%s error=%s", template_name, source, e)
+        form_metrics.template(template_name).record_error(e)
+        raise HTTPException(status_code=500, detail=f"Error computing stats: {str(e)}")
+    
+    return _timed_response(timings, {
+        "message": f"Computed {template_name} stats",
+        "source": source,
+        "count": count,
+        "components": components
+    })
+
+def _retrieved_content(template_name: str, plan: SubmissionPlan, submission_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builds the GET /forms/{template}/{form_id} response body for stored submission data.
+    """
+    return {
+        "message": f"Retrieved {template_name} form",
+        "submission_id": submission_id,
+        "data": plan.project_stored(data)
+    }
+
+async def _cache_submission(template_name: str, plan: SubmissionPlan, submission_id: str, data: Dict[str, Any]) -> None:
+    """
+    Pre-renders a new submission's GET response into the submission cache, if it is enabled.
+    """
+    if submission_cache.enabled:
+        key = SubmissionCache.key(template_name, plan.fingerprint, submission_id)
+        await submission_cache.set(key, dumps(_retrieved_content(template_name, plan, submission_id, data)))
+
+async def _save_idempotent(template_name: str, plan: SubmissionPlan, table: Table, data: Dict[str, Any], idempotency_key: str, db,
+                           timings: OperationMetrics) -> FastJSONResponse:
+    """
+    Stores a submission under an Idempotency-Key, or replays the original response for a repeated key.
+    
+    Raises:
+        HTTPException: 422 if the key was already used with a different submission.
+    """
+    cached = idempotency_cache.get(template_name, idempotency_key)
+    if cached is None:
+        row = await run_db(db, _fetch_by_idempotency_key, table, template_name, idempotency_key)
+        if row is None:
+            submission_id = uuid7()
+            try:
+                await run_db(db, _insert_submission, table, plan, submission_id, data, idempotency_key, timings)
+            except IntegrityError:
+                # A concurrent request with the same key committed first
+                await run_db(db, Session.rollback)
+                row = await run_db(db, _fetch_by_idempotency_key, table, template_name, idempotency_key)
+                if row is None:
+                    raise
+            else:
+                idempotency_cache.put(template_name, idempotency_key, str(submission_id), data)
+                await _cache_submission(template_name, plan, str(submission_id), data)
+                logger.debug("event=form.saved template=%s submission_id=%s", template_name, submission_id)
+                return _timed_response(timings, {
+                    "message": f"{template_name} submitted successfully",
+                    "submission_id": str(submission_id),
+                    "data": data
+                })
+        cached = (str(row.submission_id), row_data(row))
+        idempotency_cache.put(template_name, idempotency_key, *cached)
+    
+    submission_id, stored_data = cached
+    if stored_data != data:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different submission")
+    logger.debug("event=form.replayed template=%s submission_id=%s", template_name, submission_id)
+    return _timed_response(timings, {
+        "message": f"{template_name} submitted successfully",
+        "submission_id": submission_id,
+        "data": stored_data
+    }, headers={"Idempotent-Replayed": "true"})
+
+async def save_submission(template_name: str, plan: SubmissionPlan, table: Table, form_data: BaseModel, db,
+                          idempotency_key: Optional[str] = None) -> FastJSONResponse:
+    """
+    Stores a validated form submission.
+    
+    Args:
+        template_name: The name of the template.
+        plan: The template's compiled submission plan.
+        table: The template's submissions table.
+        form_data: The validated form data.
+        db: The database session (sync or async, see app.database.get_db).
+        idempotency_key: The Idempotency-Key header, if the client sent one.
+        
+    Returns:
+        A response with a success message and the submitted data.
+    """
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters")
+    timings = form_metrics.operation(template_name, "submit")
+    # The body has been read and validated by the time the handler runs
+    validated = since_request_start()
+    if validated is not None:
+        timings.observe_stage("validation", validated)
+    try:
+        # Convert form data to a dictionary
+        start = time.perf_counter()
+        data_dict = form_data.model_dump()
+        
+        # Project the submission onto the template's output components
+        transformed_data = plan.project_submission(data_dict)
+        timings.observe_stage("transform", time.perf_counter() - start)
+        log_payload(logger, "form.received", template_name, transformed_data)
+        
+        # Keyed submissions need the unique index to detect repeats, so they never go through the queue
+        if idempotency_key is not None:
+            return await _save_idempotent(template_name, plan, table, transformed_data, idempotency_key, db, timings)
+        
+        # Generate a unique, time-ordered ID for the submission
+        submission_id = uuid7()
+        
+        # Insert the data into the database using the table, or hand it to the group-commit queue
+        if write_behind.running:
+            # The wait for the group commit is recorded as the commit stage
+            start = time.perf_counter()
+            await write_behind.submit(plan, table, {
+                "submission_id": submission_id, "data": transformed_data, **template_values(table, template_name)
+            })
+            timings.observe_stage("commit", time.perf_counter() - start)
+        else:
+            await run_db(db, _insert_submission, table, plan, submission_id, transformed_data, None, timings)
+        
+        logger.debug("event=form.saved template=%s submission_id=%s", template_name, submission_id)
+        await _cache_submission(template_name, plan, str(submission_id), transformed_data)
+        
+        # Return success response with the transformed data
+        return _timed_response(timings, {
+            "message": f"{template_name} submitted successfully",
+            "submission_id": str(submission_id),
+            "data": transformed_data
+        })
+    except HTTPException:
+        raise
+    except WriteBehindFull as e:
+        logger.warning("event=form.save_rejected template=%s error=%s", template_name, e)
+        form_metrics.template(template_name).record_error(e)
+        raise HTTPException(status_code=429, detail="Too many pending submissions, retry shortly", headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error("event=form.save_failed template=%s error=%s", template_name, e)
+        form_metrics.template(template_name).record_error(e)
+        await run_db(db, Session.rollback)
+        raise HTTPException(status_code=500, detail=f"Error saving submission: {str(e)}")
+
+async def load_submission(template_name: str, plan: SubmissionPlan, table: Table, form_id: str, db) -> Response:
+    """
+    Retrieves a form submission by ID.
+    
+    Submissions never change once stored, so rendered responses are served from the submission
+    cache when possible and added to it on a miss.
+    
+    Args:
+        template_name: The name of the template.
+        plan: The template's compiled submission plan.
+        table: The template's submissions table.
+        form_id: The unique identifier for the form submission.
+        db: The database session (sync or async, see app.database.get_db).
+        
+    Returns:
+        A response with the retrieved form data.
+    """
+    submission_id = parse_submission_id(form_id)
+    if submission_id is None:
+        raise HTTPException(status_code=404, detail=f"{template_name} submission with ID {form_id} not found")
+    canonical_id = str(submission_id)
+    timings = form_metrics.operation(template_name, "get")
+    cache_key = None
+    if submission_cache.enabled:
+        cache_key = SubmissionCache.key(template_name, plan.fingerprint, canonical_id)
+        start = time.perf_counter()
+        body = await submission_cache.get(cache_key)
+        timings.observe_stage("cache", time.perf_counter() - start)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+    try:
+        # Query the database for the submission using the table
+        data = await _timed_db(timings, db, _fetch_submission_data, table, template_name, submission_id)
+        
+        if data is None:
+            raise HTTPException(status_code=404, detail=f"{template_name} submission with ID {form_id} not found")
+        
+        logger.debug("event=form.retrieved template=%s submission_id=%s", template_name, canonical_id)
+        
+        # Wrap values in the expected format and remember the rendered body
+        response = _timed_response(timings, _retrieved_content(template_name, plan, canonical_id, data))
+        if cache_key is not None:
+            await submission_cache.set(cache_key, response.body)
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("event=form.retrieve_failed template=%s error=%s", template_name, e)
+        form_metrics.template(template_name).record_error(e)
+        raise HTTPException(status_code=500, detail=f"Error retrieving submission: {str(e)}")
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Any]:
+    """
+    Yields one decoded JSON document (or the JSONDecodeError) per non-empty line of a streamed NDJSON body.
+    """
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield e
+    if buffer.strip():
+        try:
+            yield json.loads(buffer)
+        except json.JSONDecodeError as e:
+            yield e
+
+async def save_batch(template_name: str, model: BaseModel, plan: SubmissionPlan, table: Table, request: Request, db) -> FastJSONResponse:
+    """
+    Validates and stores a batch of form submissions.
+    
+    The body is either a JSON array of forms or an NDJSON stream (one form per line). Every item
+    is validated with the template model and all valid items are inserted in one transaction.
+    
+    Args:
+        template_name: The name of the template.
+        model: The Pydantic model for the template.
+        plan: The template's compiled submission plan.
+        table: The template's submissions table.
+        request: The incoming request, read as a JSON array or streamed as NDJSON.
+        db: The database session (sync or async, see app.database.get_db).
+        
+    Returns:
+        A response with per-item submission IDs or validation errors.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type in NDJSON_MEDIA_TYPES:
+        items = _iter_ndjson(request)
+    else:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {str(e)}")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=422, detail="Batch body must be a JSON array of forms")
+        if len(body) > BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds the maximum of {BATCH_MAX_ITEMS} forms")
+        
+        async def _iter_list():
+            for item in body:
+                yield item
+        items = _iter_list()
+    
+    # Validate each item independently so one bad form does not reject the whole batch
+    timings = form_metrics.operation(template_name, "batch")
+    validation_seconds = 0.0
+    transform_seconds = 0.0
+    rows = []
+    results = []
+    index = 0
+    async for item in items:
+        if index >= BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Batch exceeds the maximum of {BATCH_MAX_ITEMS} forms")
+        if isinstance(item, json.JSONDecodeError):
+            results.append({"index": index, "errors": [{"type": "json_invalid", "msg": str(item)}]})
+        else:
+            start = time.perf_counter()
+            try:
+                form_data = model.model_validate(item)
+            except ValidationError as e:
+                validation_seconds += time.perf_counter() - start
+                results.append({"index": index, "errors": e.errors(include_url=False, include_context=False, include_input=False)})
+            else:
+                validated = time.perf_counter()
+                validation_seconds += validated - start
+                submission_id = uuid7()
+                rows.append({
+                    "submission_id": submission_id,
+                    "data": plan.project_submission(form_data.model_dump()),
+                    **template_values(table, template_name)
+                })
+                results.append({"index": index, "submission_id": str(submission_id)})
+                transform_seconds += time.perf_counter() - validated
+        index += 1
+    timings.observe_stage("validation", validation_seconds)
+    timings.observe_stage("transform", transform_seconds)
+    
+    try:
+        if rows:
+            await run_db(db, _insert_submissions, table, plan, rows, timings)
+    except Exception as e:
+        logger.error("event=batch.save_failed template=%s error=%s", template_name, e)
+        form_metrics.template(template_name).record_error(e)
+        await run_db(db, Session.rollback)
+        raise HTTPException(status_code=500, detail=f"Error saving batch: {str(e)}")
+    
+    logger.debug("event=batch.saved template=%s accepted=%d total=%d", template_name, len(rows), index)
+    
+    return _timed_response(timings, {
+        "message": f"{template_name} batch processed",
+        "accepted": len(rows),
+        "rejected": index - len(rows),
+        "results": results
+    })
 
 def create_post_endpoint(template_name: str, model: BaseModel) -> Callable:
     """
@@ -25,71 +574,24 @@ def create_post_endpoint(template_name: str, model: BaseModel) -> Callable:
     Returns:
         A function that handles POST requests for the template.
     """
-    # Get or create the table for this template
-    table = create_dynamic_table(template_name)
+    # Get the table and the compiled plan for this template
+    table = get_dynamic_table(template_name)
+    plan = registry.get_plan(template_name)
     
-    async def post_endpoint(form_data: model, db: Session = Depends(get_db)):
+    async def post_endpoint(form_data: model, db = Depends(get_db),
+                            idempotency_key: Optional[str] = Header(None, description="Repeats with the same key return the original response")):
         """
         Handles form submission for a specific template.
         
         Args:
             form_data: The form data to be submitted.
-            db: The database session.
+            db: The database session (sync or async, see app.database.get_db).
+            idempotency_key: Optional Idempotency-Key header; a repeated key returns the original response.
             
         Returns:
             A dictionary with a success message and the submitted data.
         """
-        try:
-            # Generate a unique ID for the submission
-            submission_id = str(uuid.uuid4())
-            
-            # Convert form data to a dictionary
-            data_dict = form_data.model_dump()
-            logger.info(f"Received form data: {data_dict}")
-            
-            # Get the template components
-            template_components = templates_data.get(template_name, [])
-            
-            # Create a mapping from componentID to componentName and track components with output
-            id_to_name_map = {}
-            name_to_id_map = {}
-            for comp in template_components:
-                comp_id = comp.get("componentID")
-                comp_name = comp.get("componentName")
-                output_type = comp.get("output", {}).get("type", "none")
-                if comp_id and comp_name and output_type != "none":
-                    id_to_name_map[comp_id] = comp_name
-                    name_to_id_map[comp_name] = comp_id
-            
-            logger.info(f"Component mappings - ID to Name: {id_to_name_map}")
-            
-            # Transform the data to use componentID as keys and extract only the values
-            transformed_data = {}
-            for component_id, component_data in data_dict.items():
-                logger.info(f"Processing component {component_id} with data {component_data}")
-                if component_id in id_to_name_map:
-                    # Store using componentID as key
-                    transformed_data[component_id] = component_data.get("value")
-            
-            logger.info(f"Transformed data: {transformed_data}")
-            
-            # Insert the data into the database using the table
-            stmt = insert(table).values(submission_id=submission_id, data=transformed_data)
-            db.execute(stmt)
-            db.commit()
-            
-            logger.info(f"Saved {template_name} submission with ID: {submission_id}")
-            
-            # Return success response with the transformed data
-            return {
-                "message": f"{template_name} submitted successfully",
-                "submission_id": submission_id,
-                "data": transformed_data
-            }
-        except Exception as e:
-            logger.error(f"Error saving {template_name} submission: {str(e)}")
-            db.rollback()
-            raise HTTPException(status_code=500, detail=f"Error saving submission: {str(e)}")
+        return await save_submission(template_name, plan, table, form_data, db, idempotency_key)
     
     return post_endpoint
 
@@ -104,63 +606,201 @@ def create_get_endpoint(template_name: str, model: BaseModel) -> Callable:
     Returns:
         A function that handles GET requests for the template.
     """
-    # Get or create the table for this template
-    table = create_dynamic_table(template_name)
+    # Get the table and the compiled plan for this template
+    table = get_dynamic_table(template_name)
+    plan = registry.get_plan(template_name)
     
     async def get_endpoint(form_id: str = Path(..., description="Unique identifier for the form submission"), 
-                          db: Session = Depends(get_db)):
+                          db = Depends(get_db)):
         """
         Retrieves a form submission by ID.
         
         Args:
             form_id: The unique identifier for the form submission.
-            db: The database session.
+            db: The database session (sync or async, see app.database.get_db).
             
         Returns:
             A dictionary with the retrieved form data.
         """
-        try:
-            # Query the database for the submission using the table
-            stmt = select(table.c.data).where(table.c.submission_id == form_id)
-            result = db.execute(stmt).fetchone()
-            
-            if not result:
-                raise HTTPException(status_code=404, detail=f"{template_name} submission with ID {form_id} not found")
-            
-            # Extract the data from the result
-            data = result[0]
-            
-            # Get the template components
-            template_components = templates_data.get(template_name, [])
-            
-            # Create a mapping from componentID to componentName for components with output
-            id_to_name_map = {}
-            for comp in template_components:
-                comp_id = comp.get("componentID")
-                comp_name = comp.get("componentName")
-                output_type = comp.get("output", {}).get("type", "none")
-                if comp_id and comp_name and output_type != "none":
-                    id_to_name_map[comp_id] = comp_name
-            
-            # Transform the data to wrap values in the expected format
-            transformed_data = {}
-            for component_id, value in data.items():
-                if component_id in id_to_name_map:
-                    # Wrap the value in a dictionary with a "value" key
-                    transformed_data[component_id] = {"value": value}
-            
-            logger.info(f"Retrieved {template_name} submission with ID: {form_id}")
+        return await load_submission(template_name, plan, table, form_id, db)
+    
+    return get_endpoint 
+
+def create_batch_endpoint(template_name: str, model: BaseModel) -> Callable:
+    """
+    Creates a batch POST endpoint handler for a specific template.
+    
+    Args:
+        template_name: The name of the template.
+        model: The Pydantic model for the template.
+        
+    Returns:
+        A function that handles batch POST requests for the template.
+    """
+    # Get the table and the compiled plan for this template
+    table = get_dynamic_table(template_name)
+    plan = registry.get_plan(template_name)
+    
+    async def batch_endpoint(request: Request, db = Depends(get_db)):
+        """
+        Handles a batch of form submissions for a specific template.
+        
+        Args:
+            request: The incoming request, read as a JSON array or streamed as NDJSON.
+            db: The database session (sync or async, see app.database.get_db).
             
-            # Return the data
-            return {
-                "message": f"Retrieved {template_name} form",
-                "submission_id": form_id,
-                "data": transformed_data
-            }
-        except HTTPException:
-            raise
-        except Exception as e:
-            logger.error(f"Error retrieving {template_name} submission: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error retrieving submission: {str(e)}")
-    
-    return get_endpoint 
\ No newline at end of file
+        Returns:
+            A dictionary with per-item submission IDs or validation errors.
+        """
+        return await save_batch(template_name, model, plan, table, request, db)
+    
+    return batch_endpoint
+
+def create_list_endpoint(template_name: str, model: BaseModel) -> Callable:
+    """
+    Creates a GET endpoint handler that lists submissions for a specific template.
+    
+    Args:
+        template_name: The name of the template.
+        model: The Pydantic model for the template.
+        
+    Returns:
+        A function that handles list requests for the template.
+    """
+    # Get the table and the compiled plan for this template
+    table = get_dynamic_table(template_name)
+    plan = registry.get_plan(template_name)
+    
+    async def list_endpoint(after: Optional[int] = Query(None, ge=0, description="Cursor returned as next_cursor by the previous page"),
+                            limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+                            filters: List[str] = Query([], alias="filter", description="componentID:op:value, op is one of eq, ne, lt, lte, gt, gte"),
+                            db = Depends(get_db)):
+        """
+        Lists submissions for a specific template.
+        """
+        return await list_submissions(template_name, plan, table, after, limit, filters, db)
+    
+    return list_endpoint
+
+def create_stats_endpoint(template_name: str, model: BaseModel) -> Callable:
+    """
+    Creates a GET endpoint handler that aggregates submissions for a specific template.
+    
+    Args:
+        template_name: The name of the template.
+        model: The Pydantic model for the template.
+        
+    Returns:
+        A function that handles stats requests for the template.
+    """
+    # Get the table and the compiled plan for this template
+    table = get_dynamic_table(template_name)
+    plan = registry.get_plan(template_name)
+    
+    async def stats_endpoint(source: Optional[Literal["summary", "scan"]] = Query(None, description="Defaults to the summary table when it can answer"),
+                             filters: List[str] = Query([], alias="filter", description="componentID:op:value, op is one of eq, ne, lt, lte, gt, gte"),
+                             db = Depends(get_db)):
+        """
+        Computes per-component aggregates for a specific template.
+        """
+        return await load_stats(template_name, plan, table, source, filters, db)
+    
+    return stats_endpoint
+
+def create_export_endpoint(template_name: str, model: BaseModel) -> Callable:
+    """
+    Creates a GET endpoint handler that streams all submissions for a specific template.
+    
+    Args:
+        template_name: The name of the template.
+        model: The Pydantic model for the template.
+        
+    Returns:
+        A function that handles export requests for the template.
+    """
+    # Get the table and the compiled plan for this template
+    table = get_dynamic_table(template_name)
+    plan = registry.get_plan(template_name)
+    
+    async def export_endpoint(export_format: Literal["ndjson", "csv", "parquet"] = Query("ndjson", alias="format"),
+                              filters: List[str] = Query([], alias="filter", description="componentID:op:value, op is one of eq, ne, lt, lte, gt, gte")):
+        """
+        Streams submissions for a specific template as NDJSON, CSV or Parquet.
+        """
+        return export_submissions(template_name, plan, table, export_format, build_filter_clauses(plan, table, filters))
+    
+    return export_endpoint
+
+def _resolve_template(template_name: str):
+    """
+    Looks up the model, plan and table for a template in dispatch mode.
+    
+    Raises:
+        HTTPException: If the template is not found.
+    """
+    if not registry.has_template(template_name):
+        raise HTTPException(status_code=404, detail=f"Template '{template_name}' not found")
+    return registry.get_template_model(template_name), registry.get_plan(template_name), get_dynamic_table(template_name)
+
+async def dispatch_post_endpoint(request: Request,
+                                 template_name: str = Path(..., description="Name of the form template"),
+                                 db = Depends(get_db),
+                                 idempotency_key: Optional[str] = Header(None, description="Repeats with the same key return the original response")):
+    """
+    Handles form submission for any template, validating the body against the template's model.
+    """
+    model, plan, table = _resolve_template(template_name)
+    body = await request.body()
+    try:
+        form_data = model.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()], body=body)
+    return await save_submission(template_name, plan, table, form_data, db, idempotency_key)
+
+async def dispatch_batch_endpoint(request: Request,
+                                  template_name: str = Path(..., description="Name of the form template"),
+                                  db = Depends(get_db)):
+    """
+    Handles a batch of form submissions for any template.
+    """
+    model, plan, table = _resolve_template(template_name)
+    return await save_batch(template_name, model, plan, table, request, db)
+
+async def dispatch_get_endpoint(template_name: str = Path(..., description="Name of the form template"),
+                                form_id: str = Path(..., description="Unique identifier for the form submission"),
+                                db = Depends(get_db)):
+    """
+    Retrieves a form submission by ID for any template.
+    """
+    _, plan, table = _resolve_template(template_name)
+    return await load_submission(template_name, plan, table, form_id, db)
+
+async def dispatch_list_endpoint(template_name: str = Path(..., description="Name of the form template"),
+                                 after: Optional[int] = Query(None, ge=0, description="Cursor returned as next_cursor by the previous page"),
+                                 limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+                                 filters: List[str] = Query([], alias="filter", description="componentID:op:value, op is one of eq, ne, lt, lte, gt, gte"),
+                                 db = Depends(get_db)):
+    """
+    Lists submissions for any template.
+    """
+    _, plan, table = _resolve_template(template_name)
+    return await list_submissions(template_name, plan, table, after, limit, filters, db)
+
+async def dispatch_export_endpoint(template_name: str = Path(..., description="Name of the form template"),
+                                   export_format: Literal["ndjson", "csv", "parquet"] = Query("ndjson", alias="format"),
+                                   filters: List[str] = Query([], alias="filter", description="componentID:op:value, op is one of eq, ne, lt, lte, gt, gte")):
+    """
+    Streams submissions for any template as NDJSON, CSV or Parquet.
+    """
+    _, plan, table = _resolve_template(template_name)
+    return export_submissions(template_name, plan, table, export_format, build_filter_clauses(plan, table, filters))
+
+async def dispatch_stats_endpoint(template_name: str = Path(..., description="Name of the form template"),
+                                  source: Optional[Literal["summary", "scan"]] = Query(None, description="Defaults to the summary table when it can answer"),
+                                  filters: List[str] = Query([], alias="filter", description="componentID:op:value, op is one of eq, ne, lt, lte, gt, gte"),
+                                  db = Depends(get_db)):
+    """
+    Computes per-component aggregates for any template.
+    """
+    _, plan, table = _resolve_template(template_name)
+    return await load_stats(template_name, plan, table, source, filters, db)
@@ -0,0 +1,279 @@
+import csv
+import io
+import logging
+import os
+from typing import Any, AsyncIterator, Iterator, List, Sequence
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Table, select
+
+from app.compression import data_columns, row_data
+from app.database import SessionLocal, USE_ASYNC_DB
+from app.plans import SubmissionPlan
+from app.responses import dumps
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - Parquet export is optional
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip from the server-side cursor; also the Parquet row group size
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def _text_cell(value: Any) -> Any:
+    """
+    Renders a value for a text cell: strings as-is, None as empty, everything else as JSON.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return dumps(value).decode("utf-8")
+
+class NdjsonEncoder:
+    """
+    Encodes submissions as one JSON object per line: {"submission_id": ..., "<componentID>": value, ...}.
+    """
+
+    def __init__(self, plan: SubmissionPlan):
+        self.output_ids = plan.output_ids
+
+    def begin(self) -> bytes:
+        return b""
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        output_ids = self.output_ids
+        lines = []
+        for submission_id, data in rows:
+            record = {"submission_id": str(submission_id)}
+            for component_id in output_ids:
+                record[component_id] = data.get(component_id)
+            lines.append(dumps(record))
+        lines.append(b"")
+        return b"\n".join(lines)
+
+    def finish(self) -> bytes:
+        return b""
+
+class CsvEncoder:
+    """
+    Encodes submissions as CSV with a submission_id column and one column per output component.
+
+    Array and object values are written as JSON.
+    """
+
+    def __init__(self, plan: SubmissionPlan):
+        self.output_ids = plan.output_ids
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _drain(self) -> bytes:
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text.encode("utf-8")
+
+    def begin(self) -> bytes:
+        self._writer.writerow(("submission_id",) + self.output_ids)
+        return self._drain()
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        output_ids = self.output_ids
+        self._writer.writerows(
+            [str(submission_id)] + [_text_cell(data.get(component_id)) for component_id in output_ids]
+            for submission_id, data in rows
+        )
+        return self._drain()
+
+    def finish(self) -> bytes:
+        return b""
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands out what was written since the last drain, for streaming Parquet.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class ParquetEncoder:
+    """
+    Encodes submissions as Parquet, writing one row group per fetched batch.
+
+    Scalar and array output types map to Parquet types; anything else is stored as a JSON string.
+    """
+
+    def __init__(self, plan: SubmissionPlan):
+        self.output_ids = plan.output_ids
+        self._text_ids = set()
+        fields = [pyarrow.field("submission_id", pyarrow.string())]
+        for component_id in plan.output_ids:
+            arrow_type = self._arrow_type(plan.components_by_id[component_id].output_type)
+            if arrow_type is None:
+                arrow_type = pyarrow.string()
+                self._text_ids.add(component_id)
+            fields.append(pyarrow.field(component_id, arrow_type))
+        self.schema = pyarrow.schema(fields)
+        self._sink = _ChunkSink()
+        self._writer = None
+
+    @staticmethod
+    def _arrow_type(output_type: str):
+        scalar_types = {"string": pyarrow.string(), "number": pyarrow.float64(), "boolean": pyarrow.bool_(), "bool": pyarrow.bool_()}
+        if output_type in scalar_types:
+            return scalar_types[output_type]
+        if output_type.endswith("[]") and output_type[:-2] in scalar_types:
+            return pyarrow.list_(scalar_types[output_type[:-2]])
+        return None
+
+    def begin(self) -> bytes:
+        self._writer = pyarrow.parquet.ParquetWriter(self._sink, self.schema)
+        return self._sink.drain()
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        columns = [[str(row[0]) for row in rows]]
+        for component_id in self.output_ids:
+            values = [row[1].get(component_id) for row in rows]
+            if component_id in self._text_ids:
+                values = [None if value is None else _text_cell(value) for value in values]
+            columns.append(values)
+        self._writer.write_table(pyarrow.Table.from_pydict(dict(zip(self.schema.names, columns)), schema=self.schema))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+# Encoder classes keyed by the export format query parameter
+EXPORT_ENCODERS = {
+    "ndjson": NdjsonEncoder,
+    "csv": CsvEncoder,
+    "parquet": ParquetEncoder,
+}
+
+def _submission_rows(rows: Sequence[Any]) -> Sequence[Any]:
+    """
+    Returns (submission_id, data) pairs for a batch of rows, decompressing data where needed.
+    """
+    if not rows or "data_compressed" not in rows[0]._fields:
+        return rows
+    return [(row.submission_id, row_data(row)) for row in rows]
+
+def _iter_export_sync(stmt, encoder) -> Iterator[bytes]:
+    """
+    Yields the encoded export from a synchronous session, fetching rows with a server-side cursor.
+    """
+    db = SessionLocal()
+    try:
+        yield encoder.begin()
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield encoder.encode(_submission_rows(rows))
+        yield encoder.finish()
+    finally:
+        db.close()
+
+async def _stream_export_sync(stmt, encoder) -> AsyncIterator[bytes]:
+    """
+    Drives _iter_export_sync in the threadpool, closing its session even if the client disconnects.
+    """
+    chunks = _iter_export_sync(stmt, encoder)
+    try:
+        while True:
+            chunk = await run_in_threadpool(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await run_in_threadpool(chunks.close)
+
+async def _stream_export_async(stmt, encoder) -> AsyncIterator[bytes]:
+    """
+    Yields the encoded export from an AsyncSession, fetching rows with a server-side cursor.
+    """
+    async with SessionLocal() as db:
+        yield encoder.begin()
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield encoder.encode(_submission_rows(rows))
+        yield encoder.finish()
+
+async def _log_stream_errors(template_name: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Passes non-empty chunks through, logging failures that happen after the response has started.
+    """
+    try:
+        async for chunk in chunks:
+            if chunk:
+                yield chunk
+    except Exception as e:
+        logger.error("event=form.export_failed template=%s error=%s", template_name, e)
+        raise
+    logger.debug("event=form.exported template=%s", template_name)
+
+def export_submissions(template_name: str, plan: SubmissionPlan, table: Table, export_format: str,
+                       clauses: List[Any]) -> StreamingResponse:
+    """
+    Streams every submission of a template, in id order, as NDJSON, CSV or Parquet.
+
+    Rows are read with a server-side cursor and encoded one batch at a time, so memory use does not
+    grow with the table. The export opens its own session because the request's session is closed
+    before the response body is streamed.
+
+    Args:
+        template_name: The name of the template.
+        plan: The template's compiled submission plan.
+        table: The template's submissions table.
+        export_format: One of "ndjson", "csv" or "parquet".
+        clauses: Filter clauses from build_filter_clauses.
+
+    Returns:
+        A streaming response with one column per output component.
+
+    Raises:
+        HTTPException: If Parquet is requested and pyarrow is not installed.
+    """
+    if export_format == "parquet" and pyarrow is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow to be installed")
+
+    stmt = select(table.c.submission_id, *data_columns(table))
+    for clause in clauses:
+        stmt = stmt.where(clause)
+    stmt = stmt.order_by(table.c.id)
+
+    encoder = EXPORT_ENCODERS[export_format](plan)
+    chunks = _stream_export_async(stmt, encoder) if USE_ASYNC_DB else _stream_export_sync(stmt, encoder)
+    return StreamingResponse(
+        _log_stream_errors(template_name, chunks),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{template_name}.{export_format}"'}
+    )
@@ -0,0 +1,55 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Completed idempotent submissions remembered in memory per worker, and for how long (seconds)
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_CACHE_TTL = float(os.getenv("IDEMPOTENCY_CACHE_TTL", "86400"))
+
+# Longest Idempotency-Key accepted; matches the idempotency_key column
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+class IdempotencyCache:
+    """
+    LRU cache with a TTL of completed idempotent submissions, keyed by template name and key.
+
+    The unique index on idempotency_key stays the source of truth; the cache only saves the database
+    round trip when a client retries. It is used from the event loop only, so it takes no lock.
+    """
+
+    def __init__(self, max_entries: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, template_name: str, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Returns the submission ID and stored data for a key, or None if it is unknown or expired.
+        """
+        entry = self._entries.get((template_name, key))
+        if entry is None:
+            return None
+        expires_at, submission_id, data = entry
+        if expires_at < time.monotonic():
+            del self._entries[(template_name, key)]
+            return None
+        self._entries.move_to_end((template_name, key))
+        return submission_id, data
+
+    def put(self, template_name: str, key: str, submission_id: str, data: Dict[str, Any]) -> None:
+        """
+        Remembers a completed submission, evicting the least recently used entries beyond max_entries.
+        """
+        if self.max_entries <= 0:
+            return
+        self._entries[(template_name, key)] = (time.monotonic() + self.ttl, submission_id, data)
+        self._entries.move_to_end((template_name, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Process-wide cache
+idempotency_cache = IdempotencyCache()
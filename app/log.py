@@ -0,0 +1,69 @@
+import logging
+import os
+import random
+from typing import Any, Dict, FrozenSet
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Logging settings from environment variables
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of submissions whose payloads are logged (only ever at DEBUG level)
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+# Component IDs whose values are masked in payload logs, or "*" to mask every value
+LOG_REDACT_FIELDS: FrozenSet[str] = frozenset(
+    field.strip() for field in os.getenv("LOG_REDACT_FIELDS", "").split(",") if field.strip()
+)
+
+REDACTED = "***"
+
+_configured = False
+
+def configure_logging() -> None:
+    """
+    Configures the root logger once, using LOG_LEVEL.
+    """
+    global _configured
+    if _configured:
+        return
+    logging.basicConfig(
+        level=getattr(logging, LOG_LEVEL, logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s"
+    )
+    _configured = True
+
+def redact_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Returns a copy of a submission payload with the configured fields masked.
+
+    Args:
+        payload: A mapping of componentID to submitted value.
+
+    Returns:
+        The payload with redacted values replaced by "***".
+    """
+    if not LOG_REDACT_FIELDS:
+        return payload
+    if "*" in LOG_REDACT_FIELDS:
+        return {key: REDACTED for key in payload}
+    return {key: REDACTED if key in LOG_REDACT_FIELDS else value for key, value in payload.items()}
+
+def log_payload(logger: logging.Logger, event: str, template_name: str, payload: Dict[str, Any]) -> None:
+    """
+    Logs a submission payload at DEBUG level, subject to sampling and redaction.
+
+    Nothing is formatted or copied unless DEBUG is enabled for the logger and the payload is sampled.
+
+    Args:
+        logger: The logger to write to.
+        event: A short event name, e.g. "form.received".
+        template_name: The name of the template.
+        payload: A mapping of componentID to submitted value.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1.0 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    logger.debug("event=%s template=%s payload=%s", event, template_name, redact_payload(payload))
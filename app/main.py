@@ -1,67 +1,41 @@
+import asyncio
+import hmac
 import logging
 import argparse
 import os
-from fastapi import FastAPI
-import uvicorn
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Response
 from dotenv import load_dotenv
 
-from app.config import load_config
-from app.models import create_component_model, create_template_model
-from app.endpoints import create_post_endpoint, create_get_endpoint
-from app.database import initialize_db
+from app.log import configure_logging
+from app.responses import FastJSONResponse
+from app.registry import registry, LAZY_TEMPLATES
+from app.routes import register_template_routes, register_dispatch_routes, register_upload_routes, LazyTemplateRoutes, ROUTING_MODE
+from app.database import engine, get_pool_status, USE_ASYNC_DB
+from app.serve import serve
+from app.bootstrap import bootstrap_schema, SCHEMA_BOOTSTRAP
+from app.reload import reload_templates, watch_templates, TEMPLATES_RELOAD_INTERVAL
+from app.write_behind import write_behind, WRITE_BEHIND
+from app.cache import submission_cache
+from app.metrics import MetricsMiddleware, render_metrics, PROMETHEUS_CONTENT_TYPE
 from app.template_endpoints import (
     get_all_templates, 
     get_template_by_name, 
     get_all_components, 
     get_component_by_name,
-    get_template_schema
+    get_template_schema,
+    catalog_response
 )
 
 # Load environment variables
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Define configuration file paths
-COMPONENTS_CONFIG_FILE = "components_config.json"
-TEMPLATES_FILE = "templates.json"
-
-# Get root path from environment variables
+# Get root path and admin token from environment variables
 ROOT_PATH = os.getenv("ROOT_PATH", "")
-
-# Load configuration files
-components_config = load_config(COMPONENTS_CONFIG_FILE)
-templates_data = load_config(TEMPLATES_FILE)
-
-# Create dynamic component models from components_config.json
-component_models = {}
-for comp in components_config:
-    comp_name = comp.get("componentName")
-    if not comp_name:
-        logger.warning("A component without a componentName encountered; skipping.")
-        continue
-    try:
-        model = create_component_model(comp)
-        if model:  # Only add models for components with output
-            component_models[comp_name] = model
-            logger.info(f"Created model for component: {comp_name}")
-    except Exception as e:
-        logger.error(f"Failed to create model for component {comp_name}: {e}")
-        raise
-
-# Create dynamic template models from templates.json
-template_models = {}
-for template_name, template_components in templates_data.items():
-    try:
-        # Create template model using the component configurations
-        model = create_template_model(template_name, template_components, component_models)
-        if model:  # Only add models that have fields
-            template_models[template_name] = model
-            logger.info(f"Created template model for: {template_name}")
-    except Exception as e:
-        logger.error(f"Failed to create template model for {template_name}: {e}")
-        raise
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 # Initialize FastAPI application
 app = FastAPI(
@@ -71,77 +45,150 @@ app = FastAPI(
     root_path=ROOT_PATH,  # Set the root path for the OpenAPI documentation
     docs_url="/docs",  # Keep the docs URL as /docs
     openapi_url="/openapi.json",  # Keep the OpenAPI URL as /openapi.json
+    default_response_class=FastJSONResponse,  # orjson-backed, falls back to the stdlib encoder
 )
 
+# Count form requests and time them; exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Initialize the database
 @app.on_event("startup")
 async def startup_event():
-    initialize_db()
-    logger.info("Database initialized on startup")
+    if SCHEMA_BOOTSTRAP:
+        await bootstrap_schema(registry.templates_data)
+        logger.info("Database initialized on startup")
+    if WRITE_BEHIND:
+        write_behind.start()
+        logger.info("Write-behind enabled: up to %d submissions per commit", write_behind.max_batch)
+    if TEMPLATES_RELOAD_INTERVAL > 0:
+        app.state.template_watcher = asyncio.create_task(watch_templates(app))
+        logger.info("Watching configuration files every %ss", TEMPLATES_RELOAD_INTERVAL)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    watcher = getattr(app.state, "template_watcher", None)
+    if watcher is not None:
+        watcher.cancel()
+    # Commit everything already acknowledged to the queue before the worker exits
+    await write_behind.drain()
+    # Close pooled connections; aiosqlite's connection threads would otherwise keep the process alive
+    if USE_ASYNC_DB:
+        await engine.dispose()
+    else:
+        engine.dispose()
 
 # Register template-related endpoints
 @app.get("/templates", summary="Get all templates", tags=["Templates"])
-async def get_templates():
+async def get_templates(if_none_match: Optional[str] = Header(None)):
     """
     Get all available templates with their component definitions.
     """
-    return get_all_templates()
+    return catalog_response(get_all_templates(), if_none_match)
 
 @app.get("/templates/{template_name}", summary="Get template by name", tags=["Templates"])
-async def get_template(template_name: str):
+async def get_template(template_name: str, if_none_match: Optional[str] = Header(None)):
     """
     Get a specific template by name.
     """
-    return get_template_by_name(template_name)
+    return catalog_response(get_template_by_name(template_name), if_none_match)
 
 @app.get("/templates/{template_name}/schema", summary="Get template schema", tags=["Templates"])
-async def get_schema(template_name: str):
+async def get_schema(template_name: str, if_none_match: Optional[str] = Header(None)):
     """
     Get the schema for a specific template.
     """
-    return get_template_schema(template_name)
+    return catalog_response(get_template_schema(template_name), if_none_match)
 
 @app.get("/components", summary="Get all components", tags=["Components"])
-async def get_components():
+async def get_components(if_none_match: Optional[str] = Header(None)):
     """
     Get all available components.
     """
-    return get_all_components()
+    return catalog_response(get_all_components(), if_none_match)
 
 @app.get("/components/{component_name}", summary="Get component by name", tags=["Components"])
-async def get_component(component_name: str):
+async def get_component(component_name: str, if_none_match: Optional[str] = Header(None)):
     """
     Get a specific component by name.
     """
-    return get_component_by_name(component_name)
+    return catalog_response(get_component_by_name(component_name), if_none_match)
 
-# Dynamically register endpoints for each template
-for template_name, model in template_models.items():
-    post_path = f"/forms/{template_name}"
-    get_path = f"/forms/{template_name}/{{form_id}}"
+@app.get("/metrics", summary="Get Prometheus metrics", tags=["Monitoring"], response_class=Response)
+async def get_metrics():
+    """
+    Get per-template request counts, latency by stage, payload sizes and errors, plus pool, cache and
+    write-behind statistics, in the Prometheus text format. Values are for this worker.
+    """
+    stats = {
+        "db_pool": get_pool_status(),
+        "cache": submission_cache.stats(),
+        "write_behind": write_behind.stats(),
+    }
+    return Response(content=render_metrics(stats), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/stats/db-pool", summary="Get database connection pool statistics", tags=["Monitoring"])
+async def get_db_pool_stats():
+    """
+    Get checked-out, idle and overflow connection counts and checkout wait times for this worker.
+    """
+    return FastJSONResponse(get_pool_status())
 
-    app.post(
-        post_path,
-        response_model=dict,  # Using dict as response_model since we're returning a message and data
-        summary=f"Submit {template_name} form",
-        tags=["Forms"]
-    )(create_post_endpoint(template_name, model))
+@app.get("/stats/cache", summary="Get submission cache statistics", tags=["Monitoring"])
+async def get_cache_stats():
+    """
+    Get hit/miss counters and the memory used by this worker's submission cache.
+    """
+    return FastJSONResponse(submission_cache.stats())
 
-    app.get(
-        get_path,
-        response_model=dict,  # Using dict as response_model for the same reason
-        summary=f"Retrieve {template_name} form by ID",
-        tags=["Forms"]
-    )(create_get_endpoint(template_name, model))
+@app.get("/stats/write-behind", summary="Get write-behind queue statistics", tags=["Monitoring"])
+async def get_write_behind_stats():
+    """
+    Get the depth, capacity and commit counters of this worker's write-behind queue.
+    """
+    return FastJSONResponse(write_behind.stats())
 
-    logger.info(f"Registered endpoints for template: {template_name} (POST: {post_path}, GET: {get_path})")
+@app.post("/admin/templates/reload", summary="Reload templates without restarting", tags=["Admin"])
+async def reload_templates_endpoint(x_admin_token: Optional[str] = Header(None)):
+    """
+    Re-read templates.json and components_config.json and apply the changes in this worker.
+    
+    Requires the X-Admin-Token header to match ADMIN_TOKEN; disabled when ADMIN_TOKEN is unset.
+    """
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Template reload is not permitted")
+    try:
+        return FastJSONResponse(await reload_templates(app))
+    except Exception as e:
+        logger.error("event=templates.reload_failed error=%s", e)
+        raise HTTPException(status_code=500, detail=f"Error reloading templates: {str(e)}")
+
+# File uploads are served by one pair of routes whatever the routing mode
+register_upload_routes(app)
+
+# Register the dispatching form routes, or endpoints for each template (on first use in lazy mode)
+if ROUTING_MODE == "dispatch":
+    if not LAZY_TEMPLATES:
+        registry.build_all()
+    register_dispatch_routes(app)
+    logger.info("Dispatch routing mode: one set of form routes for %d templates", len(registry.templates_data))
+elif LAZY_TEMPLATES:
+    app.add_middleware(LazyTemplateRoutes, fastapi_app=app)
+    logger.info("Lazy template mode: form routes are registered on first use")
+else:
+    registry.build_all()
+    for template_name in registry.templates_data:
+        register_template_routes(app, template_name)
+    logger.info("Registered form endpoints for %d templates", len(registry.templates_data))
 
 if __name__ == "__main__":
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Form Builder Microservice")
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind the server to")
     parser.add_argument("--port", type=int, default=8000, help="Port to bind the server to")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes forked from this preloaded one")
+    parser.add_argument("--max-requests", type=int, default=0, help="Restart a worker after this many requests (0 never restarts)")
+    parser.add_argument("--max-requests-jitter", type=int, default=0, help="Random extra requests per worker before it restarts")
     args = parser.parse_args()
     
-    # Run the application
-    uvicorn.run("app.main:app", host=args.host, port=args.port, reload=False) 
\ No newline at end of file
+    # Run the application already loaded in this process, forking workers when asked to
+    serve(app, args.host, args.port, args.workers, args.max_requests, args.max_requests_jitter) 
\ No newline at end of file
@@ -0,0 +1,284 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.registry import registry
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the payload size histogram buckets, in bytes
+SIZE_BUCKETS: Tuple[float, ...] = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Stages timed for each form operation; a slow request can be attributed to the slowest stage
+OPERATION_STAGES: Dict[str, Tuple[str, ...]] = {
+    "submit": ("validation", "transform", "db_execute", "commit", "serialization"),
+    "batch": ("validation", "transform", "db_execute", "commit", "serialization"),
+    "get": ("cache", "db_execute", "serialization"),
+    "list": ("db_execute", "serialization"),
+    "stats": ("db_execute", "serialization"),
+    "upload": ("storage",),
+    "download": (),
+    "export": (),
+    "other": (),
+}
+
+# Requests for paths that do not name a known template are counted under this label
+UNKNOWN_TEMPLATE = "_unknown"
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Fields of the pool, cache and write-behind stats that only ever increase, exported as counters
+COUNTER_FIELDS = frozenset({
+    "checkouts", "timeouts", "wait_seconds_total", "hits", "shared_hits", "misses",
+    "accepted", "rejected", "groups_committed", "failed",
+})
+
+# perf_counter() at which the current request entered the metrics middleware
+request_started: ContextVar[Optional[float]] = ContextVar("request_started", default=None)
+
+class Histogram:
+    """
+    Fixed-bucket histogram; observing a value only increments preallocated counters.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...], lock: threading.Lock):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = lock
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+class OperationMetrics:
+    """
+    Status counts, total latency and per-stage latency of one form operation of one template.
+    """
+
+    __slots__ = ("statuses", "duration", "stages", "_lock")
+
+    def __init__(self, stages: Tuple[str, ...], lock: threading.Lock):
+        self.statuses: Dict[int, int] = {}
+        self.duration = Histogram(LATENCY_BUCKETS, lock)
+        self.stages = {stage: Histogram(LATENCY_BUCKETS, lock) for stage in stages}
+        self._lock = lock
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        self.stages[stage].observe(seconds)
+
+    def record_request(self, status: int, seconds: float) -> None:
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.duration.observe(seconds)
+
+class TemplateMetrics:
+    """
+    Every metric kept for one template, allocated together the first time the template is used.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.operations = {operation: OperationMetrics(stages, self._lock) for operation, stages in OPERATION_STAGES.items()}
+        self.request_bytes = Histogram(SIZE_BUCKETS, self._lock)
+        self.response_bytes = Histogram(SIZE_BUCKETS, self._lock)
+        self.errors: Dict[str, int] = {}
+
+    def record_error(self, error: BaseException) -> None:
+        """
+        Counts an exception raised while handling a request, by exception class name.
+        """
+        name = type(error).__name__
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+class FormMetrics:
+    """
+    Per-template request metrics for this worker.
+    """
+
+    def __init__(self):
+        self._templates: Dict[str, TemplateMetrics] = {}
+        self._lock = threading.Lock()
+
+    def template(self, template_name: str) -> TemplateMetrics:
+        metrics = self._templates.get(template_name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._templates.setdefault(template_name, TemplateMetrics())
+        return metrics
+
+    def operation(self, template_name: str, operation: str) -> OperationMetrics:
+        return self.template(template_name).operations[operation]
+
+    def snapshot(self) -> List[Tuple[str, TemplateMetrics]]:
+        with self._lock:
+            return sorted(self._templates.items())
+
+# Process-wide form metrics
+form_metrics = FormMetrics()
+
+def since_request_start() -> Optional[float]:
+    """
+    Returns the seconds elapsed since the metrics middleware received the current request, if it did.
+    """
+    started = request_started.get()
+    return time.perf_counter() - started if started is not None else None
+
+def classify_form_path(method: str, path: str) -> Optional[Tuple[str, str]]:
+    """
+    Maps a request to its (template, operation) labels, or None if it is not a form route.
+    """
+    if not path.startswith("/forms/"):
+        return None
+    parts = path[len("/forms/"):].split("/")
+    template_name = parts[0] if registry.has_template(parts[0]) else UNKNOWN_TEMPLATE
+    if len(parts) == 1:
+        operation = "submit" if method == "POST" else "list"
+    elif len(parts) == 2 and method == "POST" and parts[1] == "batch":
+        operation = "batch"
+    elif len(parts) in (3, 4) and parts[1] == "uploads":
+        operation = "upload" if method == "POST" else "download"
+    elif len(parts) == 2 and method == "GET":
+        operation = parts[1] if parts[1] in ("export", "stats") else "get"
+    else:
+        operation = "other"
+    return template_name, operation
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that counts form requests and records their latency and payload sizes.
+
+    Requests outside /forms/ are passed through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        labels = classify_form_path(scope["method"], path)
+        if labels is None:
+            await self.app(scope, receive, send)
+            return
+
+        template_name, operation = labels
+        metrics = form_metrics.template(template_name)
+        start = time.perf_counter()
+        token = request_started.set(start)
+        status = 500
+        received = 0
+        sent = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            request_started.reset(token)
+            metrics.operations[operation].record_request(status, time.perf_counter() - start)
+            metrics.request_bytes.observe(received)
+            metrics.response_bytes.observe(sent)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _render_histogram(lines: List[str], name: str, labels: str, histogram: Histogram) -> None:
+    with histogram._lock:
+        counts = list(histogram.counts)
+        total = histogram.sum
+        count = histogram.count
+    cumulative = 0
+    for bound, bucket_count in zip(histogram.buckets, counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f"{name}_sum{{{labels}}} {_format_value(total)}")
+    lines.append(f"{name}_count{{{labels}}} {count}")
+
+def render_metrics(stats: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    """
+    Renders the form metrics, plus numeric fields of other stats dictionaries, in Prometheus text format.
+
+    Args:
+        stats: Stats dictionaries keyed by prefix, e.g. {"db_pool": get_pool_status()}. Each numeric
+            field in COUNTER_FIELDS becomes a form_<prefix>_<field>_total counter, and every other
+            numeric field a form_<prefix>_<field> gauge.
+
+    Returns:
+        The exposition text.
+    """
+    templates = form_metrics.snapshot()
+    requests: List[str] = ["# HELP form_requests_total Form requests by template, operation and status.", "# TYPE form_requests_total counter"]
+    durations: List[str] = ["# HELP form_request_duration_seconds Form request latency.", "# TYPE form_request_duration_seconds histogram"]
+    stages: List[str] = ["# HELP form_stage_duration_seconds Form request latency by processing stage.", "# TYPE form_stage_duration_seconds histogram"]
+    request_bytes: List[str] = ["# HELP form_request_bytes Form request body sizes.", "# TYPE form_request_bytes histogram"]
+    response_bytes: List[str] = ["# HELP form_response_bytes Form response body sizes.", "# TYPE form_response_bytes histogram"]
+    errors: List[str] = ["# HELP form_errors_total Exceptions raised by form handlers, by exception type.", "# TYPE form_errors_total counter"]
+
+    for template_name, metrics in templates:
+        template_label = f'template="{_escape(template_name)}"'
+        for operation, operation_metrics in metrics.operations.items():
+            if not operation_metrics.duration.count:
+                continue
+            labels = f'{template_label},operation="{operation}"'
+            with metrics._lock:
+                statuses = sorted(operation_metrics.statuses.items())
+            for status, count in statuses:
+                requests.append(f'form_requests_total{{{labels},status="{status}"}} {count}')
+            _render_histogram(durations, "form_request_duration_seconds", labels, operation_metrics.duration)
+            for stage, histogram in operation_metrics.stages.items():
+                if histogram.count:
+                    _render_histogram(stages, "form_stage_duration_seconds", f'{labels},stage="{stage}"', histogram)
+        if metrics.request_bytes.count:
+            _render_histogram(request_bytes, "form_request_bytes", template_label, metrics.request_bytes)
+            _render_histogram(response_bytes, "form_response_bytes", template_label, metrics.response_bytes)
+        with metrics._lock:
+            template_errors = sorted(metrics.errors.items())
+        for error_type, count in template_errors:
+            errors.append(f'form_errors_total{{{template_label},type="{_escape(error_type)}"}} {count}')
+
+    lines = requests + durations + stages + request_bytes + response_bytes + errors
+    for prefix, fields in (stats or {}).items():
+        for field, value in fields.items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            name = f"form_{prefix}_{field}"
+            if field in COUNTER_FIELDS:
+                if not name.endswith("_total"):
+                    name += "_total"
+                lines.append(f"# TYPE {name} counter")
+            else:
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
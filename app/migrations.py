@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+from typing import List, Optional
+
+from sqlalchemy import MetaData, Table, bindparam, exists, inspect, insert, select, text, update
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.compression import compact_data, expand_data
+from app.database import (
+    engine, USE_ASYNC_DB, run_ddl, get_dynamic_table, has_text_submission_ids, missing_columns,
+    define_template_table, get_shared_table, create_submissions_table, declares_jsonb, template_clauses
+)
+from app.registry import registry
+from app.stats import stats_table, rebuild_summary
+
+logger = logging.getLogger(__name__)
+
+# Rows copied per round trip when a table has to be rebuilt
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+
+def _quote(conn, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+def _rebuild_with_uuid_ids(conn, table: Table) -> None:
+    """
+    Rebuilds a table with binary submission IDs on databases that cannot change a column's type in place.
+    """
+    legacy_name = f"{table.name}__text_ids"
+    for index in inspect(conn).get_indexes(table.name):
+        conn.execute(text(f"DROP INDEX {_quote(conn, index['name'])}"))
+    conn.execute(text(f"ALTER TABLE {_quote(conn, table.name)} RENAME TO {_quote(conn, legacy_name)}"))
+    # Reflect the renamed table so columns added by later migrations are copied too
+    legacy = Table(legacy_name, MetaData(), autoload_with=conn)
+    columns = [legacy.c.id, legacy.c.submission_id, legacy.c.data]
+    for optional_column in ("data_compressed", "idempotency_key"):
+        if optional_column in legacy.c:
+            columns.append(legacy.c[optional_column])
+    table.create(bind=conn)
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(*columns).where(legacy.c.id > last_id).order_by(legacy.c.id).limit(MIGRATION_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(insert(table), [
+            {
+                "id": row.id,
+                "submission_id": row.submission_id,
+                "data": row.data,
+                "data_compressed": row._mapping.get("data_compressed"),
+                "idempotency_key": row._mapping.get("idempotency_key"),
+            }
+            for row in rows
+        ])
+        last_id = rows[-1].id
+    legacy.drop(bind=conn)
+
+def _migrate_submission_ids(conn, table: Table, dry_run: bool) -> bool:
+    """
+    Converts a table's text submission IDs to UUIDs, returning True if the table needed it.
+    """
+    if not inspect(conn).has_table(table.name) or not has_text_submission_ids(conn, table.name):
+        return False
+    if dry_run:
+        return True
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            f"ALTER TABLE {_quote(conn, table.name)} "
+            "ALTER COLUMN submission_id TYPE uuid USING submission_id::uuid"
+        ))
+    else:
+        _rebuild_with_uuid_ids(conn, table)
+    return True
+
+async def migrate_submission_ids(template_names: List[str], dry_run: bool = False) -> List[str]:
+    """
+    Converts the submission_id column of existing tables from text to UUID.
+
+    Each table is migrated in its own transaction. Existing IDs keep their value; an ID that is not
+    a valid UUID aborts that table's migration.
+
+    Args:
+        template_names: The templates whose tables should be migrated.
+        dry_run: Only report which tables need migrating.
+
+    Returns:
+        The names of the tables that were (or, in a dry run, would be) migrated.
+    """
+    migrated = []
+    for template_name in template_names:
+        table = get_dynamic_table(template_name)
+        if await run_ddl(_migrate_submission_ids, table, dry_run):
+            migrated.append(table.name)
+            logger.info("event=migration.submission_ids table=%s dry_run=%s", table.name, dry_run)
+    return migrated
+
+def _add_idempotency_keys(conn, table: Table, dry_run: bool) -> bool:
+    """
+    Adds the idempotency_key column and its unique index to a table, returning True if it was missing.
+    """
+    if not inspect(conn).has_table(table.name) or "idempotency_key" not in missing_columns(conn, table):
+        return False
+    if dry_run:
+        return True
+    column = table.c.idempotency_key
+    conn.execute(text(
+        f"ALTER TABLE {_quote(conn, table.name)} "
+        f"ADD COLUMN {_quote(conn, column.name)} {column.type.compile(dialect=conn.dialect)}"
+    ))
+    for index in table.indexes:
+        if index.columns.contains_column(column):
+            index.create(bind=conn, checkfirst=True)
+    return True
+
+async def migrate_idempotency_keys(template_names: List[str], dry_run: bool = False) -> List[str]:
+    """
+    Adds the nullable idempotency_key column, with a unique index, to existing tables.
+
+    Args:
+        template_names: The templates whose tables should be migrated.
+        dry_run: Only report which tables need migrating.
+
+    Returns:
+        The names of the tables that were (or, in a dry run, would be) migrated.
+    """
+    migrated = []
+    for template_name in template_names:
+        table = get_dynamic_table(template_name)
+        if await run_ddl(_add_idempotency_keys, table, dry_run):
+            migrated.append(table.name)
+            logger.info("event=migration.idempotency_keys table=%s dry_run=%s", table.name, dry_run)
+    return migrated
+
+def _copy_to_shared_table(conn, template_name: str, dry_run: bool) -> Optional[str]:
+    """
+    Copies a template's per-template table into the shared table, returning the source table's name if it did.
+    
+    Empty tables, and templates that already have rows in the shared table, are skipped, so the
+    migration can be re-run.
+    """
+    shared = get_shared_table()
+    inspector = inspect(conn)
+    source = define_template_table(template_name, MetaData())
+    if not inspector.has_table(source.name) or not conn.execute(select(exists(select(source.c.id)))).scalar():
+        return None
+    legacy_name = source.name
+    if inspector.has_table(shared.name):
+        already_copied = conn.execute(select(exists().where(shared.c.template == template_name))).scalar()
+        if already_copied:
+            return None
+    if dry_run:
+        return legacy_name
+    if not inspector.has_table(shared.name):
+        create_submissions_table(conn, shared)
+
+    # Reflect the source so tables that predate the UUID and idempotency key migrations copy too
+    legacy = Table(legacy_name, MetaData(), autoload_with=conn)
+    columns = [legacy.c.id, legacy.c.submission_id, legacy.c.data]
+    for optional_column in ("data_compressed", "idempotency_key"):
+        if optional_column in legacy.c:
+            columns.append(legacy.c[optional_column])
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(*columns).where(legacy.c.id > last_id).order_by(legacy.c.id).limit(MIGRATION_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(insert(shared), [
+            {
+                "template": template_name,
+                "submission_id": uuid.UUID(bytes=bytes(row.submission_id)) if isinstance(row.submission_id, (bytes, memoryview)) else row.submission_id,
+                "data": row.data,
+                "data_compressed": row._mapping.get("data_compressed"),
+                "idempotency_key": row._mapping.get("idempotency_key"),
+            }
+            for row in rows
+        ])
+        last_id = rows[-1].id
+    return legacy_name
+
+async def migrate_to_shared_table(template_names: List[str], dry_run: bool = False) -> List[str]:
+    """
+    Copies per-template tables into the shared submissions table used by STORAGE_LAYOUT=shared.
+    
+    Each template is copied in its own transaction, in id order. Submission IDs, data and
+    idempotency keys are kept; the shared table assigns new ids, so list cursors issued before
+    the migration are not valid afterwards. Source tables are left in place to be dropped once
+    the shared layout is in use.
+
+    Args:
+        template_names: The templates whose tables should be copied.
+        dry_run: Only report which tables would be copied.
+
+    Returns:
+        The names of the tables that were (or, in a dry run, would be) copied.
+    """
+    migrated = []
+    for template_name in template_names:
+        legacy_name = await run_ddl(_copy_to_shared_table, template_name, dry_run)
+        if legacy_name is not None:
+            migrated.append(legacy_name)
+            logger.info("event=migration.shared_table template=%s table=%s dry_run=%s", template_name, legacy_name, dry_run)
+    return migrated
+
+def _compact_storage(conn, template_name: str, dry_run: bool) -> Optional[int]:
+    """
+    Brings a template's stored data to the current storage format, returning the number of rows rewritten.
+
+    Returns None if the table does not exist or already needs no change.
+    """
+    plan = registry.get_plan(template_name)
+    table = get_dynamic_table(template_name)
+    if not inspect(conn).has_table(table.name):
+        return None
+    existing = {column["name"]: column for column in inspect(conn).get_columns(table.name)}
+    json_data = declares_jsonb(table) and not isinstance(existing["data"]["type"], JSONB)
+    has_compressed = "data_compressed" in existing
+    if not dry_run:
+        if json_data:
+            conn.execute(text(f"ALTER TABLE {_quote(conn, table.name)} ALTER COLUMN data TYPE jsonb USING data::jsonb"))
+        if not has_compressed:
+            column = table.c.data_compressed
+            conn.execute(text(
+                f"ALTER TABLE {_quote(conn, table.name)} "
+                f"ADD COLUMN {_quote(conn, column.name)} {column.type.compile(dialect=conn.dialect)}"
+            ))
+            has_compressed = True
+
+    clauses = template_clauses(table, template_name)
+    columns = [table.c.id, table.c.data] + ([table.c.data_compressed] if has_compressed else [])
+    rewrite = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"), *clauses)
+        .values(data=bindparam("stored_data"), data_compressed=bindparam("stored_blob"))
+    )
+    rewritten = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(*columns).where(table.c.id > last_id, *clauses).order_by(table.c.id).limit(MIGRATION_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        changed = []
+        for row in rows:
+            blob = row._mapping.get("data_compressed")
+            stored_data, stored_blob = compact_data(plan, expand_data(row.data, blob))
+            if stored_blob != (bytes(blob) if blob is not None else None):
+                changed.append({"row_id": row.id, "stored_data": stored_data, "stored_blob": stored_blob})
+        if changed and not dry_run:
+            conn.execute(rewrite, changed)
+        rewritten += len(changed)
+        last_id = rows[-1].id
+    if not json_data and "data_compressed" in existing and not rewritten:
+        return None
+    return rewritten
+
+async def compact_storage(template_names: List[str], dry_run: bool = False) -> List[str]:
+    """
+    Converts existing tables to the compact storage format and recompresses their submissions.
+
+    On PostgreSQL the data column is converted from JSON to JSONB. Every table gets the
+    data_compressed column, and each row is rewritten as DATA_COMPRESSION would store it now:
+    large submissions are compressed, and with compression turned off compressed components are
+    moved back into the data column. Run it again after making a component filterable or
+    aggregated, so rows that compressed it have it in the data column again. Each template is
+    migrated in its own transaction.
+
+    Args:
+        template_names: The templates whose tables should be migrated.
+        dry_run: Only report which tables need migrating.
+
+    Returns:
+        The names of the tables that were (or, in a dry run, would be) migrated.
+    """
+    migrated = []
+    for template_name in template_names:
+        rewritten = await run_ddl(_compact_storage, template_name, dry_run)
+        if rewritten is not None:
+            table_name = get_dynamic_table(template_name).name
+            migrated.append(table_name)
+            logger.info("event=migration.compact_storage template=%s table=%s rewritten=%d dry_run=%s",
+                        template_name, table_name, rewritten, dry_run)
+    return migrated
+
+def _rebuild_stats(conn, template_name: str, dry_run: bool) -> Optional[int]:
+    """
+    Recomputes a template's stats summary, returning the number of submissions summarized.
+    
+    Templates whose table does not exist yet, or that have no aggregated components, are skipped.
+    """
+    plan = registry.get_plan(template_name)
+    table = get_dynamic_table(template_name)
+    if not plan.stats_components or not inspect(conn).has_table(table.name):
+        return None
+    if dry_run:
+        return 0
+    stats_table.create(bind=conn, checkfirst=True)
+    return rebuild_summary(conn, plan, table, MIGRATION_BATCH_SIZE)
+
+def _recreate_unsharded_stats_table(conn, dry_run: bool) -> bool:
+    """
+    Drops and recreates a summary table created before it had shards, returning True if it did.
+
+    Its rows are derived data, and the shard is part of the primary key the upserts rely on.
+    """
+    inspector = inspect(conn)
+    if not inspector.has_table(stats_table.name):
+        return False
+    if any(column["name"] == "shard" for column in inspector.get_columns(stats_table.name)):
+        return False
+    if not dry_run:
+        stats_table.drop(bind=conn)
+        stats_table.create(bind=conn)
+    return True
+
+async def rebuild_stats(template_names: List[str], dry_run: bool = False) -> List[str]:
+    """
+    Rebuilds the stats summaries of existing submissions.
+    
+    Needed once when summaries are enabled on a database that already holds submissions, and
+    whenever a template's aggregated components, their minValue/maxValue or
+    STATS_HISTOGRAM_BINS change. Each template is rebuilt in its own transaction; submissions
+    inserted while it runs may be miscounted, so rebuild while the template receives none. A
+    summary table from before shards existed is recreated, and then every template is rebuilt.
+
+    Args:
+        template_names: The templates whose summaries should be rebuilt.
+        dry_run: Only report which templates would be rebuilt.
+
+    Returns:
+        The names of the templates that were (or, in a dry run, would be) rebuilt.
+    """
+    if await run_ddl(_recreate_unsharded_stats_table, dry_run):
+        logger.info("event=migration.stats_table_recreated dry_run=%s", dry_run)
+        template_names = list(registry.templates_data)
+    rebuilt = []
+    for template_name in template_names:
+        submissions = await run_ddl(_rebuild_stats, template_name, dry_run)
+        if submissions is not None:
+            rebuilt.append(template_name)
+            logger.info("event=migration.stats template=%s submissions=%d dry_run=%s", template_name, submissions, dry_run)
+    return rebuilt
+
+# Migration coroutines and their help text, keyed by subcommand
+MIGRATIONS = {
+    "submission-ids": (migrate_submission_ids, "Convert text submission IDs to native/binary UUIDs"),
+    "idempotency-keys": (migrate_idempotency_keys, "Add the idempotency_key column and unique index"),
+    "shared-table": (migrate_to_shared_table, "Copy per-template tables into the shared submissions table"),
+    "compact-storage": (compact_storage, "Convert data to JSONB, add data_compressed and recompress submissions"),
+    "stats": (rebuild_stats, "Rebuild the stats summaries from the stored submissions"),
+}
+
+async def _run(args: argparse.Namespace) -> None:
+    try:
+        template_names = args.template or list(registry.templates_data)
+        migrate, _ = MIGRATIONS[args.command]
+        migrated = await migrate(template_names, args.dry_run)
+        logger.info("%s %d of %d tables", "Would migrate" if args.dry_run else "Migrated", len(migrated), len(template_names))
+    finally:
+        if USE_ASYNC_DB:
+            await engine.dispose()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Form Builder database migrations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, (_, help_text) in MIGRATIONS.items():
+        subparser = subparsers.add_parser(command, help=help_text)
+        subparser.add_argument("--template", action="append", help="Only migrate this template (repeatable)")
+        subparser.add_argument("--dry-run", action="store_true", help="Only list the tables that need migrating")
+
+    asyncio.run(_run(parser.parse_args(argv)))
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ from typing import Any, Dict, List, Tuple, Optional, Type, Generic, TypeVar
 from pydantic import BaseModel, create_model, Field
 from pydantic.generics import GenericModel
 
+from app.validation import build_value_annotation
+
 T = TypeVar('T')
 
 # Mapping from configuration type strings to Python types (with required ellipsis)
@@ -10,6 +12,7 @@ type_mapping: Dict[str, Tuple[Any, Any]] = {
     "string": (str, ...),
     "number": (float, ...),
     "boolean": (bool, ...),
+    "bool": (bool, ...),
     "object": (dict, ...),
     "array": (list, ...),
     "string[]": (List[str], ...),
@@ -83,24 +86,24 @@ def create_template_model(template_name: str, template_components: List[Dict[str
                 # Determine the element type (remove the [] suffix)
                 element_type_name = output_type[:-2]
                 element_type = type_mapping.get(element_type_name, (str, ...))[0]
-                
-                # Create a model with a value field that's explicitly an array
-                component_model = create_model(
-                    f"{component_name}Value",
-                    value=(List[element_type], ...),
-                    __base__=BaseModel
-                )
+                python_type = List[element_type]
             else:
                 # For non-array types, use the standard approach
                 python_type = type_mapping.get(output_type, (str, ...))[0]
-                component_model = create_model(
-                    f"{component_name}Value",
-                    value=(python_type, ...),
-                    __base__=BaseModel
-                )
-                
-            # Use componentID as the field name
-            field_definitions[component_id] = (component_model, ...)
+            
+            # Apply the component's validations (bounds, lengths, patterns, formats) to the value
+            component_model = create_model(
+                f"{component_name}Value",
+                value=(build_value_annotation(component, output_type, python_type), ...),
+                __base__=BaseModel
+            )
+            
+            # Use componentID as the field name; components without a "required" rule may be omitted
+            is_required = any(v.get("type") == "required" for v in component.get("validations", []))
+            if is_required:
+                field_definitions[component_id] = (component_model, ...)
+            else:
+                field_definitions[component_id] = (Optional[component_model], None)
     
     # Create and return the model, even if empty
     model_name = f"{template_name.capitalize()}Model"
@@ -0,0 +1,173 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from app.validation import upload_rules
+
+# Aggregate kept by /forms/{template}/stats for each output type
+STATS_KINDS = {"string": "options", "string[]": "options", "number": "numeric", "boolean": "boolean", "bool": "boolean"}
+
+# Attributes that mark a string component as a choice between fixed options rather than free text
+_CHOICE_ATTRIBUTE = re.compile(r"^options$|^option\d+Text$")
+
+@dataclass(frozen=True)
+class ComponentPlan:
+    """Precompiled description of a single output component in a template."""
+    component_id: str
+    component_name: str
+    output_type: str
+    required: bool
+    filterable: bool
+    validations: Tuple[Dict[str, Any], ...]
+    stats_kind: Optional[str] = None
+    stats_range: Optional[Tuple[float, float]] = None
+    accepts_uploads: bool = False
+    upload_types: Optional[FrozenSet[str]] = None
+    upload_max_bytes: Optional[float] = None
+
+@dataclass(frozen=True)
+class SubmissionPlan:
+    """
+    Immutable, precompiled view of a template used by the submission hot path.
+
+    Attributes:
+        template_name: The name of the template.
+        components: Every output component in template order (duplicates kept, as in the config).
+        output_ids: The distinct output component IDs in template order.
+        output_id_set: The same IDs as a frozenset for O(1) membership checks.
+        components_by_id: The output components keyed by ID (the last duplicate wins).
+        filterable_types: Output types of the components marked ``"filterable": true``, keyed by ID.
+        stats_components: The components aggregated by ``/forms/{name}/stats``, one per ID.
+        queryable_ids: The IDs that SQL reads from the data column (filterable or aggregated); they are never compressed.
+        schema: The response body served by ``/templates/{name}/schema``.
+        fingerprint: A short hash of the output IDs; it changes whenever stored data would be projected differently.
+    """
+    template_name: str
+    components: Tuple[ComponentPlan, ...]
+    output_ids: Tuple[str, ...]
+    output_id_set: FrozenSet[str]
+    components_by_id: Dict[str, ComponentPlan]
+    filterable_types: Dict[str, str]
+    stats_components: Tuple[ComponentPlan, ...]
+    queryable_ids: FrozenSet[str]
+    schema: Dict[str, Any]
+    fingerprint: str
+
+    def project_submission(self, data_dict: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Projects a dumped template model onto the stored representation ({componentID: value}).
+
+        Optional components that were not submitted are left out.
+        """
+        return {
+            component_id: data_dict[component_id].get("value")
+            for component_id in self.output_ids
+            if data_dict.get(component_id) is not None
+        }
+
+    def project_stored(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Projects stored submission data onto the response representation ({componentID: {"value": value}}).
+        """
+        output_id_set = self.output_id_set
+        return {
+            component_id: {"value": value}
+            for component_id, value in data.items()
+            if component_id in output_id_set
+        }
+
+def _stats_settings(component: Dict[str, Any], output_type: str) -> Tuple[Optional[str], Optional[Tuple[float, float]]]:
+    """
+    Returns the stats aggregate of a component and, for numbers, the range its histogram spans.
+
+    Numbers and booleans are aggregated, as are strings and string arrays with fixed options
+    (an ``options`` or ``optionNText`` attribute); free text is not, unless the component sets
+    ``"stats": true``; ``"stats": false`` opts any component out. A number gets a histogram when it
+    declares minValue and maxValue.
+    """
+    kind = STATS_KINDS.get(output_type)
+    attributes = {a.get("name"): a.get("value") for a in component.get("attributes", []) if isinstance(a, dict)}
+    enabled = component.get("stats")
+    if enabled is None:
+        enabled = kind != "options" or any(_CHOICE_ATTRIBUTE.match(str(name)) for name in attributes)
+    if kind is None or not enabled:
+        return None, None
+    stats_range = None
+    lower, upper = attributes.get("minValue"), attributes.get("maxValue")
+    if kind == "numeric" and isinstance(lower, (int, float)) and isinstance(upper, (int, float)) and upper > lower:
+        stats_range = (float(lower), float(upper))
+    return kind, stats_range
+
+def compile_submission_plan(template_name: str, template_components: List[Dict[str, Any]]) -> SubmissionPlan:
+    """
+    Compiles the output components of a template into a SubmissionPlan.
+
+    Args:
+        template_name: The name of the template.
+        template_components: A list of component configurations in the template.
+
+    Returns:
+        The compiled SubmissionPlan.
+    """
+    components = []
+    output_ids = []
+    for component in template_components:
+        component_id = component.get("componentID")
+        component_name = component.get("componentName")
+        output_type = component.get("output", {}).get("type", "none")
+
+        # Skip components without output or without an identity
+        if not component_id or not component_name or output_type == "none":
+            continue
+
+        validations = tuple(dict(v) for v in component.get("validations", []))
+        is_required = any(v.get("type") == "required" for v in validations)
+
+        stats_kind, stats_range = _stats_settings(component, output_type)
+        accepts_uploads, upload_types, upload_max_bytes = upload_rules(component, output_type)
+
+        components.append(ComponentPlan(
+            component_id=component_id,
+            component_name=component_name,
+            output_type=output_type,
+            required=is_required,
+            filterable=bool(component.get("filterable", False)),
+            validations=validations,
+            stats_kind=stats_kind,
+            stats_range=stats_range,
+            accepts_uploads=accepts_uploads,
+            upload_types=upload_types,
+            upload_max_bytes=upload_max_bytes,
+        ))
+        if component_id not in output_ids:
+            output_ids.append(component_id)
+
+    schema = {
+        "template_name": template_name,
+        "components": [
+            {
+                "name": c.component_name,
+                "type": c.output_type,
+                "required": c.required,
+                "componentID": c.component_id
+            }
+            for c in components
+        ],
+        "required_fields": [c.component_id for c in components if c.required]
+    }
+
+    components_by_id = {c.component_id: c for c in components}
+
+    return SubmissionPlan(
+        template_name=template_name,
+        components=tuple(components),
+        output_ids=tuple(output_ids),
+        output_id_set=frozenset(output_ids),
+        components_by_id=components_by_id,
+        filterable_types={cid: c.output_type for cid, c in components_by_id.items() if c.filterable},
+        stats_components=tuple(c for c in components_by_id.values() if c.stats_kind is not None),
+        queryable_ids=frozenset(cid for cid, c in components_by_id.items() if c.filterable or c.stats_kind is not None),
+        schema=schema,
+        fingerprint=hashlib.sha1("\0".join(output_ids).encode("utf-8")).hexdigest()[:12],
+    )
\ No newline at end of file
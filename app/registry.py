@@ -0,0 +1,127 @@
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from app.config import load_config
+from app.models import create_component_model, create_template_model
+from app.plans import SubmissionPlan, compile_submission_plan
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Define configuration file paths
+COMPONENTS_CONFIG_FILE = os.getenv("COMPONENTS_CONFIG_FILE", "components_config.json")
+TEMPLATES_FILE = os.getenv("TEMPLATES_FILE", "templates.json")
+
+# Build template models and register template routes on first use instead of at startup
+LAZY_TEMPLATES = os.getenv("LAZY_TEMPLATES", "false").lower() in ("1", "true", "yes")
+
+class ConfigRegistry:
+    """
+    Single owner of the parsed configuration files and everything derived from them.
+
+    Each JSON file is parsed once per process. Component models, template models and
+    submission plans are built on first use and cached.
+    """
+
+    def __init__(self, templates_file: str = TEMPLATES_FILE, components_file: str = COMPONENTS_CONFIG_FILE):
+        self.templates_file = templates_file
+        self.components_file = components_file
+        self.components_config: List[Dict[str, Any]] = load_config(components_file)
+        self.templates_data: Dict[str, List[Dict[str, Any]]] = load_config(templates_file)
+        self._component_models: Optional[Dict[str, Type[BaseModel]]] = None
+        self._template_models: Dict[str, Type[BaseModel]] = {}
+        self._plans: Dict[str, SubmissionPlan] = {}
+
+    def has_template(self, template_name: str) -> bool:
+        return template_name in self.templates_data
+
+    def get_component_models(self) -> Dict[str, Type[BaseModel]]:
+        """
+        Returns the component models from components_config.json, building them on first use.
+        """
+        if self._component_models is None:
+            component_models = {}
+            for comp in self.components_config:
+                comp_name = comp.get("componentName")
+                if not comp_name:
+                    logger.warning("A component without a componentName encountered; skipping.")
+                    continue
+                try:
+                    model = create_component_model(comp)
+                    if model:  # Only add models for components with output
+                        component_models[comp_name] = model
+                        logger.debug("event=component_model.created component=%s", comp_name)
+                except Exception as e:
+                    logger.error("Failed to create model for component %s: %s", comp_name, e)
+                    raise
+            self._component_models = component_models
+        return self._component_models
+
+    def get_template_model(self, template_name: str) -> Type[BaseModel]:
+        """
+        Returns the Pydantic model for a template, building it on first use.
+
+        Raises:
+            KeyError: If the template does not exist.
+        """
+        model = self._template_models.get(template_name)
+        if model is None:
+            template_components = self.templates_data[template_name]
+            try:
+                model = create_template_model(template_name, template_components, self.get_component_models())
+            except Exception as e:
+                logger.error("Failed to create template model for %s: %s", template_name, e)
+                raise
+            self._template_models[template_name] = model
+            logger.debug("event=template_model.created template=%s", template_name)
+        return model
+
+    def get_plan(self, template_name: str) -> SubmissionPlan:
+        """
+        Returns the compiled submission plan for a template, compiling it on first use.
+
+        Raises:
+            KeyError: If the template does not exist.
+        """
+        plan = self._plans.get(template_name)
+        if plan is None:
+            plan = compile_submission_plan(template_name, self.templates_data[template_name])
+            self._plans[template_name] = plan
+        return plan
+
+    def reuse_from(self, other: "ConfigRegistry", template_names: Iterable[str]) -> None:
+        """
+        Copies already-built models and plans for templates that did not change from another registry.
+        """
+        for template_name in template_names:
+            if template_name in other._template_models:
+                self._template_models[template_name] = other._template_models[template_name]
+            if template_name in other._plans:
+                self._plans[template_name] = other._plans[template_name]
+
+    def replace_with(self, other: "ConfigRegistry") -> None:
+        """
+        Takes over another registry's state in a single synchronous step.
+
+        Callers holding a reference to this registry see either the old or the new
+        configuration, never a mix, because no await happens while the state is swapped.
+        """
+        self.__dict__.update(other.__dict__)
+
+    def build_all(self) -> None:
+        """
+        Eagerly builds every template model and plan.
+        """
+        for template_name in self.templates_data:
+            self.get_template_model(template_name)
+            self.get_plan(template_name)
+        logger.info("Built models for %d templates", len(self._template_models))
+
+# Process-wide registry
+registry = ConfigRegistry()
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+from app.bootstrap import bootstrap_schema
+from app.registry import ConfigRegistry, registry, LAZY_TEMPLATES
+from app.routes import replace_template_routes, template_routes, ROUTING_MODE
+from app.template_endpoints import refresh_catalog
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the configuration files for changes (0 disables the watcher)
+TEMPLATES_RELOAD_INTERVAL = float(os.getenv("TEMPLATES_RELOAD_INTERVAL", "0"))
+
+# Serializes reloads triggered by the watcher and the admin endpoint
+_reload_lock = asyncio.Lock()
+
+def _config_mtimes() -> Tuple[Optional[float], Optional[float]]:
+    """
+    Returns the modification times of the templates and components files.
+    """
+    mtimes = []
+    for path in (registry.templates_file, registry.components_file):
+        try:
+            mtimes.append(os.stat(path).st_mtime)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+async def reload_templates(app: FastAPI) -> Dict[str, List[str]]:
+    """
+    Re-reads the configuration files and applies the differences without restarting.
+
+    New and changed templates get fresh models, plans and routes, new templates get their
+    tables, and removed templates lose their routes. The registry, route table and catalog
+    are swapped in one synchronous step once everything has been built.
+
+    Args:
+        app: The FastAPI application.
+
+    Returns:
+        The names of the added, changed and removed templates.
+
+    Raises:
+        RuntimeError: If a configuration file cannot be loaded; the running configuration is kept.
+    """
+    async with _reload_lock:
+        new_registry = await run_in_threadpool(ConfigRegistry, registry.templates_file, registry.components_file)
+
+        old_templates = registry.templates_data
+        new_templates = new_registry.templates_data
+        added = [name for name in new_templates if name not in old_templates]
+        removed = [name for name in old_templates if name not in new_templates]
+        changed = [name for name in new_templates if name in old_templates and new_templates[name] != old_templates[name]]
+        unchanged = [name for name in new_templates if name in old_templates and name not in changed]
+
+        # Build everything that can fail before touching the running configuration
+        new_registry.reuse_from(registry, unchanged)
+        for template_name in added + changed:
+            new_registry.get_plan(template_name)
+            if not LAZY_TEMPLATES:
+                new_registry.get_template_model(template_name)
+        await bootstrap_schema(added + changed, new_registry)
+
+        # Swap registry, routes and catalog without yielding to the event loop
+        registry.replace_with(new_registry)
+        # Dispatch mode resolves templates from the registry per request, so only per-template routes change
+        if ROUTING_MODE != "dispatch":
+            if LAZY_TEMPLATES:
+                rebuilt = [name for name in changed if name in template_routes]
+            else:
+                rebuilt = added + changed
+            replace_template_routes(app, rebuilt, removed)
+        refresh_catalog()
+
+        logger.info("Reloaded templates: added=%s changed=%s removed=%s", added, changed, removed)
+        return {"added": added, "changed": changed, "removed": removed}
+
+async def watch_templates(app: FastAPI, interval: float = TEMPLATES_RELOAD_INTERVAL) -> None:
+    """
+    Polls the configuration files and reloads them when their modification time changes.
+
+    Args:
+        app: The FastAPI application.
+        interval: Seconds between checks.
+    """
+    last_mtimes = _config_mtimes()
+    while True:
+        await asyncio.sleep(interval)
+        mtimes = _config_mtimes()
+        if mtimes == last_mtimes:
+            continue
+        try:
+            await reload_templates(app)
+            last_mtimes = mtimes
+        except Exception as e:
+            # Keep serving the previous configuration; retry on the next change
+            last_mtimes = mtimes
+            logger.error("event=templates.reload_failed error=%s", e)
@@ -0,0 +1,37 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only when orjson is not installed
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """
+    Serializes content to JSON bytes with orjson, falling back to the stdlib encoder.
+
+    The fallback produces the same compact output as Starlette's JSONResponse.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson when available.
+
+    Handlers that return this class directly also bypass FastAPI's jsonable_encoder pass,
+    so they must only return JSON-native content (dicts, lists, str, numbers, bool, None).
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
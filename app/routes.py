@@ -0,0 +1,250 @@
+import logging
+import os
+from typing import Dict, Iterable, List
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.routing import BaseRoute
+
+from app.endpoints import (
+    create_post_endpoint,
+    create_get_endpoint,
+    create_batch_endpoint,
+    create_list_endpoint,
+    create_export_endpoint,
+    create_stats_endpoint,
+    dispatch_post_endpoint,
+    dispatch_list_endpoint,
+    dispatch_get_endpoint,
+    dispatch_batch_endpoint,
+    dispatch_export_endpoint,
+    dispatch_stats_endpoint
+)
+from app.registry import registry
+from app.uploads import upload_endpoint, download_endpoint
+from app.responses import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# "per_template" registers six routes per template; "dispatch" registers six routes in total
+ROUTING_MODE = os.getenv("ROUTING_MODE", "per_template").lower()
+
+BATCH_OPENAPI_EXTRA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+            "application/x-ndjson": {"schema": {"type": "string", "description": "One form per line"}}
+        }
+    }
+}
+
+# Form routes added to the application, keyed by template name
+template_routes: Dict[str, List[BaseRoute]] = {}
+
+def build_template_routes(app: FastAPI, template_name: str) -> List[BaseRoute]:
+    """
+    Builds the POST, batch POST, list, export, stats and GET form routes for a template without adding them to the app.
+
+    Args:
+        app: The FastAPI application, used as the dependency overrides provider.
+        template_name: The name of the template.
+
+    Returns:
+        The routes for the template.
+    """
+    router = APIRouter(default_response_class=FastJSONResponse, dependency_overrides_provider=app)
+    model = registry.get_template_model(template_name)
+    post_path = f"/forms/{template_name}"
+    batch_path = f"/forms/{template_name}/batch"
+    export_path = f"/forms/{template_name}/export"
+    stats_path = f"/forms/{template_name}/stats"
+    get_path = f"/forms/{template_name}/{{form_id}}"
+
+    router.post(
+        post_path,
+        summary=f"Submit {template_name} form",
+        tags=["Forms"]
+    )(create_post_endpoint(template_name, model))
+
+    router.post(
+        batch_path,
+        summary=f"Submit a batch of {template_name} forms",
+        tags=["Forms"],
+        openapi_extra=BATCH_OPENAPI_EXTRA
+    )(create_batch_endpoint(template_name, model))
+
+    router.get(
+        post_path,
+        summary=f"List {template_name} forms",
+        tags=["Forms"]
+    )(create_list_endpoint(template_name, model))
+
+    # Registered before the GET by ID route so "export" and "stats" are not taken for form IDs
+    router.get(
+        export_path,
+        summary=f"Export {template_name} forms",
+        tags=["Forms"],
+        response_class=StreamingResponse
+    )(create_export_endpoint(template_name, model))
+
+    router.get(
+        stats_path,
+        summary=f"Get {template_name} form stats",
+        tags=["Forms"]
+    )(create_stats_endpoint(template_name, model))
+
+    router.get(
+        get_path,
+        summary=f"Retrieve {template_name} form by ID",
+        tags=["Forms"]
+    )(create_get_endpoint(template_name, model))
+
+    logger.debug("event=routes.built template=%s post=%s batch=%s get=%s", template_name, post_path, batch_path, get_path)
+    return router.routes
+
+def register_template_routes(app: FastAPI, template_name: str) -> None:
+    """
+    Registers the form routes for a template, if they are not registered yet.
+
+    Args:
+        app: The FastAPI application.
+        template_name: The name of the template.
+    """
+    if template_name in template_routes:
+        return
+
+    routes = build_template_routes(app, template_name)
+    app.router.routes.extend(routes)
+    template_routes[template_name] = routes
+    # Routes changed, so the cached OpenAPI document is stale
+    app.openapi_schema = None
+
+def register_dispatch_routes(app: FastAPI) -> None:
+    """
+    Registers the single set of form routes used in dispatch mode.
+
+    The handlers look up the template's model, plan and table per request, so the route table
+    and the OpenAPI document do not grow with the number of templates.
+
+    Args:
+        app: The FastAPI application.
+    """
+    app.post(
+        "/forms/{template_name}",
+        summary="Submit a form",
+        tags=["Forms"],
+        openapi_extra={
+            "requestBody": {
+                "required": True,
+                "content": {"application/json": {"schema": {"type": "object"}}}
+            }
+        }
+    )(dispatch_post_endpoint)
+
+    app.post(
+        "/forms/{template_name}/batch",
+        summary="Submit a batch of forms",
+        tags=["Forms"],
+        openapi_extra=BATCH_OPENAPI_EXTRA
+    )(dispatch_batch_endpoint)
+
+    app.get(
+        "/forms/{template_name}",
+        summary="List forms",
+        tags=["Forms"]
+    )(dispatch_list_endpoint)
+
+    app.get(
+        "/forms/{template_name}/export",
+        summary="Export forms",
+        tags=["Forms"],
+        response_class=StreamingResponse
+    )(dispatch_export_endpoint)
+
+    app.get(
+        "/forms/{template_name}/stats",
+        summary="Get form stats",
+        tags=["Forms"]
+    )(dispatch_stats_endpoint)
+
+    app.get(
+        "/forms/{template_name}/{form_id}",
+        summary="Retrieve a form by ID",
+        tags=["Forms"]
+    )(dispatch_get_endpoint)
+
+def register_upload_routes(app: FastAPI) -> None:
+    """
+    Registers the file upload and download routes, shared by every template in both routing modes.
+
+    Args:
+        app: The FastAPI application.
+    """
+    app.post(
+        "/forms/{template_name}/uploads/{component_id}",
+        summary="Upload a file for a form component",
+        tags=["Uploads"],
+        openapi_extra={
+            "requestBody": {
+                "required": True,
+                "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}}
+            }
+        }
+    )(upload_endpoint)
+
+    app.get(
+        "/forms/{template_name}/uploads/{component_id}/{name}",
+        summary="Download an uploaded file",
+        tags=["Uploads"],
+        response_class=StreamingResponse
+    )(download_endpoint)
+
+def replace_template_routes(app: FastAPI, rebuilt: Iterable[str], removed: Iterable[str]) -> None:
+    """
+    Rebuilds and removes template form routes, swapping the application's route table in one assignment.
+
+    Requests already being handled keep the endpoint they were routed to.
+
+    Args:
+        app: The FastAPI application.
+        rebuilt: Templates whose routes are (re)built from the current registry.
+        removed: Templates whose routes are dropped.
+    """
+    new_routes = {template_name: build_template_routes(app, template_name) for template_name in rebuilt}
+    stale = set()
+    for template_name in list(new_routes) + list(removed):
+        stale.update(id(route) for route in template_routes.get(template_name, ()))
+
+    routes = [route for route in app.router.routes if id(route) not in stale]
+    for template_routes_list in new_routes.values():
+        routes.extend(template_routes_list)
+    app.router.routes = routes
+
+    for template_name in removed:
+        template_routes.pop(template_name, None)
+    template_routes.update(new_routes)
+    app.openapi_schema = None
+
+class LazyTemplateRoutes:
+    """
+    ASGI middleware that registers a template's form routes on the first request targeting it.
+
+    Used when LAZY_TEMPLATES is enabled, so startup does not build a model per template.
+    """
+
+    def __init__(self, app, fastapi_app: FastAPI):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"]
+            root_path = scope.get("root_path", "")
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            if path.startswith("/forms/"):
+                template_name = path[len("/forms/"):].split("/", 1)[0]
+                if template_name not in template_routes and registry.has_template(template_name):
+                    register_template_routes(self.fastapi_app, template_name)
+        await self.app(scope, receive, send)
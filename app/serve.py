@@ -0,0 +1,156 @@
+import asyncio
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI
+
+from app.bootstrap import bootstrap_schema, SCHEMA_BOOTSTRAP
+from app.database import engine, USE_ASYNC_DB
+from app.registry import registry
+
+logger = logging.getLogger(__name__)
+
+# A worker that fails sooner than this after starting is restarted only after the same delay, in seconds
+WORKER_RESTART_DELAY = 1.0
+
+async def _preload_schema() -> None:
+    """
+    Bootstraps the schema once in the parent, then closes its connections so no worker inherits them.
+    """
+    try:
+        await bootstrap_schema(registry.templates_data)
+    finally:
+        if USE_ASYNC_DB:
+            await engine.dispose()
+        else:
+            engine.dispose()
+
+class PreforkServer:
+    """
+    Serves an already imported application from several forked worker processes.
+
+    The parent loads the configuration, builds the models and plans and renders the catalog once
+    (by importing the application), bootstraps the schema and binds the listening socket. It
+    then forks the workers, which share those pages copy-on-write instead of each parsing and
+    building everything again. A worker that exits, for instance after serving max_requests
+    requests, is replaced with a fresh fork of the parent.
+    """
+
+    def __init__(self, app: FastAPI, host: str, port: int, workers: int, max_requests: int = 0,
+                 max_requests_jitter: int = 0):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self._children: Dict[int, float] = {}
+        self._stopping = False
+
+    def _config(self, limit_max_requests: Optional[int] = None) -> uvicorn.Config:
+        return uvicorn.Config(self.app, host=self.host, port=self.port, reload=False,
+                              limit_max_requests=limit_max_requests)
+
+    def _run_worker(self, sock: socket.socket) -> int:
+        """
+        Runs one worker in a forked child until it is told to stop or has served its requests.
+
+        Returns:
+            The child's exit code: 0, or 3 (as uvicorn uses) if the application failed to start.
+        """
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        # Pooled connections belong to the parent; drop them without closing the parent's sockets
+        if USE_ASYNC_DB:
+            engine.sync_engine.dispose(close=False)
+        else:
+            engine.dispose(close=False)
+        limit = None
+        if self.max_requests > 0:
+            # Jitter keeps workers started together from recycling together
+            limit = self.max_requests + random.randint(0, max(0, self.max_requests_jitter))
+        server = uvicorn.Server(self._config(limit))
+        server.run(sockets=[sock])
+        return 0 if server.started else 3
+
+    def _spawn(self, sock: socket.socket) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._run_worker(sock)
+            except BaseException:
+                logger.exception("event=worker.crashed pid=%d", os.getpid())
+            finally:
+                os._exit(code)
+        self._children[pid] = time.monotonic()
+        logger.info("event=worker.started pid=%d workers=%d", pid, len(self._children))
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        """
+        Binds the socket, forks the workers and keeps their number up until SIGTERM or SIGINT.
+        """
+        if SCHEMA_BOOTSTRAP:
+            # Workers inherit the set of ensured tables, so their own startup bootstrap finds nothing to create
+            asyncio.run(_preload_schema())
+        sock = self._config().bind_socket()
+        # Keep the preloaded objects out of the collector, whose bookkeeping writes would copy their pages in every worker
+        gc.freeze()
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        logger.info("event=server.prefork host=%s port=%d workers=%d max_requests=%d",
+                    self.host, self.port, self.workers, self.max_requests)
+        for _ in range(self.workers):
+            self._spawn(sock)
+
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self._children.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if self._stopping:
+                logger.info("event=worker.stopped pid=%d code=%d", pid, code)
+                continue
+            logger.info("event=worker.exited pid=%d code=%d seconds=%.1f", pid, code, time.monotonic() - started)
+            if code != 0 and time.monotonic() - started < WORKER_RESTART_DELAY:
+                time.sleep(WORKER_RESTART_DELAY)
+            if not self._stopping:
+                self._spawn(sock)
+        sock.close()
+        logger.info("event=server.stopped")
+
+def serve(app: FastAPI, host: str, port: int, workers: int = 1, max_requests: int = 0, max_requests_jitter: int = 0) -> None:
+    """
+    Serves the application, in one process or from preloaded forked workers.
+
+    Args:
+        app: The application, already imported (and so already loaded) in this process.
+        host: The host to bind to.
+        port: The port to bind to.
+        workers: The number of worker processes.
+        max_requests: Restart a worker after it has served about this many requests (0 never restarts).
+        max_requests_jitter: Up to this many extra requests per worker, chosen at random.
+    """
+    if workers <= 1 and max_requests <= 0:
+        uvicorn.run(app, host=host, port=port, reload=False)
+        return
+    PreforkServer(app, host, port, workers, max_requests, max_requests_jitter).run()
@@ -0,0 +1,341 @@
+import logging
+import os
+import random
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import JSON, BigInteger, Column, Float, SmallInteger, String, Table, case, cast, delete, distinct, func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.compression import data_columns, row_data
+from app.database import engine, metadata, json_value, data_is_jsonb, template_clauses
+from app.plans import ComponentPlan, SubmissionPlan
+
+logger = logging.getLogger(__name__)
+
+# Maintain per-template aggregates on every insert so /forms/{template}/stats needs no scan
+STATS_SUMMARY = os.getenv("STATS_SUMMARY", "true").lower() in ("1", "true", "yes")
+# Equal-width bins in the histogram of a number component with minValue and maxValue
+STATS_HISTOGRAM_BINS = max(1, int(os.getenv("STATS_HISTOGRAM_BINS", "10")))
+# Most frequent options returned per component
+STATS_TOP_VALUES = int(os.getenv("STATS_TOP_VALUES", "50"))
+# Copies of each summary row; every insert updates one at random, so concurrent inserts rarely wait on the same row lock
+STATS_SUMMARY_SHARDS = max(1, int(os.getenv("STATS_SUMMARY_SHARDS", "16")))
+
+STATS_TABLE_NAME = "submission_stats"
+
+# Summary rows: one "submissions" row per summarized template, a "summary" row (count, sum, min, max) per
+# component, and one "value" row per option or boolean value and one "bin" row per histogram bin. Each
+# of them is split across up to STATS_SUMMARY_SHARDS shards, which are added up when read.
+stats_table = Table(
+    STATS_TABLE_NAME,
+    metadata,
+    Column('template', String(255), primary_key=True),
+    Column('component_id', String(255), primary_key=True),
+    Column('kind', String(16), primary_key=True),
+    Column('key', String(255), primary_key=True),
+    Column('shard', SmallInteger, primary_key=True),
+    Column('count', BigInteger, nullable=False),
+    Column('total', Float),
+    Column('minimum', Float),
+    Column('maximum', Float),
+)
+
+# Longest option value kept as its own summary row; longer values are truncated
+MAX_KEY_LENGTH = 255
+
+def summary_enabled() -> bool:
+    """
+    Returns True if summaries are maintained; they need an upsert, so PostgreSQL or SQLite.
+    """
+    return STATS_SUMMARY and engine.dialect.name in ("postgresql", "sqlite")
+
+@lru_cache(maxsize=None)
+def histogram_edges(stats_range: Tuple[float, float], bins: int = STATS_HISTOGRAM_BINS) -> Tuple[float, ...]:
+    """
+    Returns the lower edge of each histogram bin over a component's (minValue, maxValue) range.
+    """
+    lower, upper = stats_range
+    return tuple(lower + (upper - lower) * i / bins for i in range(bins))
+
+def _bin_index(edges: Tuple[float, ...], value: float) -> int:
+    # Values outside the range are counted in the first or last bin
+    return max(0, bisect_right(edges, value) - 1)
+
+def _option_key(value: Any) -> str:
+    return str(value)[:MAX_KEY_LENGTH]
+
+def _add(deltas: Dict[Tuple[str, str, str, str], List[Any]], key: Tuple[str, str, str, str], value: Optional[float] = None) -> None:
+    delta = deltas.get(key)
+    if delta is None:
+        deltas[key] = [1, value, value, value]
+        return
+    delta[0] += 1
+    if value is not None:
+        delta[1] += value
+        delta[2] = min(delta[2], value)
+        delta[3] = max(delta[3], value)
+
+def summarize(plan: SubmissionPlan, data: Dict[str, Any], deltas: Dict[Tuple[str, str, str, str], List[Any]]) -> None:
+    """
+    Adds one stored submission to a set of summary deltas, keyed like the summary table's primary key.
+
+    Templates without aggregated components are not summarized at all, so their inserts stay a
+    single statement.
+    """
+    if not plan.stats_components:
+        return
+    template_name = plan.template_name
+    _add(deltas, (template_name, "", "submissions", ""))
+    for component in plan.stats_components:
+        component_id = component.component_id
+        value = data.get(component_id)
+        if value is None:
+            continue
+        if component.stats_kind == "numeric":
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            value = float(value)
+            _add(deltas, (template_name, component_id, "summary", ""), value)
+            if component.stats_range is not None:
+                edges = histogram_edges(component.stats_range)
+                _add(deltas, (template_name, component_id, "bin", repr(edges[_bin_index(edges, value)])))
+        elif component.stats_kind == "boolean":
+            if not isinstance(value, bool):
+                continue
+            _add(deltas, (template_name, component_id, "summary", ""))
+            _add(deltas, (template_name, component_id, "value", "true" if value else "false"))
+        elif isinstance(value, list):
+            if not value:
+                continue
+            _add(deltas, (template_name, component_id, "summary", ""))
+            for item in value:
+                _add(deltas, (template_name, component_id, "value", _option_key(item)))
+        else:
+            _add(deltas, (template_name, component_id, "summary", ""))
+            _add(deltas, (template_name, component_id, "value", _option_key(value)))
+
+def _upsert_statement():
+    """
+    Builds the INSERT ... ON CONFLICT statement that adds deltas to existing summary rows.
+    """
+    stmt = (pg_insert if engine.dialect.name == "postgresql" else sqlite_insert)(stats_table)
+    # PostgreSQL has least/greatest; SQLite's multi-argument min/max are the scalar equivalents
+    least, greatest = (func.least, func.greatest) if engine.dialect.name == "postgresql" else (func.min, func.max)
+    current, excluded = stats_table.c, stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[current.template, current.component_id, current.kind, current.key, current.shard],
+        set_={
+            "count": current.count + excluded.count,
+            "total": current.total + excluded.total,
+            "minimum": least(func.coalesce(current.minimum, excluded.minimum), func.coalesce(excluded.minimum, current.minimum)),
+            "maximum": greatest(func.coalesce(current.maximum, excluded.maximum), func.coalesce(excluded.maximum, current.maximum)),
+        }
+    )
+
+def apply_deltas(conn, deltas: Dict[Tuple[str, str, str, str], List[Any]], shard: Optional[int] = None) -> None:
+    """
+    Adds summary deltas to one shard of the summary table on the caller's connection or session.
+
+    Rows are written in primary key order, so concurrent transactions lock them in the same order.
+
+    Args:
+        conn: The connection or session to write with.
+        deltas: The deltas from summarize.
+        shard: The shard to add them to; a random one if None.
+    """
+    if not deltas:
+        return
+    if shard is None:
+        shard = random.randrange(STATS_SUMMARY_SHARDS)
+    conn.execute(_upsert_statement(), [
+        {"template": key[0], "component_id": key[1], "kind": key[2], "key": key[3], "shard": shard,
+         "count": delta[0], "total": delta[1], "minimum": delta[2], "maximum": delta[3]}
+        for key, delta in sorted(deltas.items())
+    ])
+
+def record_submissions(conn, submissions: Iterable[Tuple[SubmissionPlan, Dict[str, Any]]]) -> None:
+    """
+    Adds newly inserted submissions to the summaries, in the caller's transaction.
+
+    The plans are the ones the submissions were validated with, so a template removed or changed
+    by a reload while they were queued is still summarized as it was.
+
+    Args:
+        conn: The connection or session that inserted the submissions.
+        submissions: (plan, stored data) pairs.
+    """
+    if not summary_enabled():
+        return
+    deltas: Dict[Tuple[str, str, str, str], List[Any]] = {}
+    for plan, data in submissions:
+        summarize(plan, data, deltas)
+    apply_deltas(conn, deltas)
+
+def _empty_stats(component: ComponentPlan) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"type": component.output_type, "count": 0}
+    if component.stats_kind == "numeric":
+        stats.update(min=None, max=None, mean=None)
+        if component.stats_range is not None:
+            edges = histogram_edges(component.stats_range)
+            upper = edges[1:] + (component.stats_range[1],)
+            stats["histogram"] = [{"min": lower, "max": high, "count": 0} for lower, high in zip(edges, upper)]
+    elif component.stats_kind == "boolean":
+        stats.update({"true": 0, "false": 0})
+    else:
+        stats.update(distinct=0, options={})
+    return stats
+
+def _top_options(counts: Iterable[Tuple[str, int]]) -> Dict[str, int]:
+    ranked = sorted(counts, key=lambda item: (-item[1], item[0]))
+    return dict(ranked[:STATS_TOP_VALUES])
+
+def read_summary(db, plan: SubmissionPlan) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    """
+    Reads a template's aggregates from the summary table.
+
+    Returns:
+        The number of submissions and the stats of each aggregated component, keyed by componentID.
+    """
+    c = stats_table.c
+    rows = db.execute(
+        select(
+            c.component_id, c.kind, c.key, func.sum(c.count).label("count"), func.sum(c.total).label("total"),
+            func.min(c.minimum).label("minimum"), func.max(c.maximum).label("maximum")
+        )
+        .where(c.template == plan.template_name)
+        .group_by(c.component_id, c.kind, c.key)
+    ).fetchall()
+    components = {component.component_id: _empty_stats(component) for component in plan.stats_components}
+    options: Dict[str, List[Tuple[str, int]]] = {}
+    submissions = 0
+    for row in rows:
+        if row.kind == "submissions":
+            submissions = row.count
+            continue
+        stats = components.get(row.component_id)
+        if stats is None:
+            # The component was removed from the template or no longer aggregated
+            continue
+        if row.kind == "summary":
+            stats["count"] = row.count
+            if "mean" in stats and row.count:
+                stats.update(min=row.minimum, max=row.maximum, mean=row.total / row.count)
+        elif row.kind == "bin" and "histogram" in stats:
+            for histogram_bin in stats["histogram"]:
+                if repr(histogram_bin["min"]) == row.key:
+                    histogram_bin["count"] = row.count
+        elif row.kind == "value" and "true" in stats:
+            if row.key in ("true", "false"):
+                stats[row.key] = row.count
+        elif row.kind == "value" and "options" in stats:
+            options.setdefault(row.component_id, []).append((row.key, row.count))
+    for component_id, counts in options.items():
+        components[component_id]["distinct"] = len(counts)
+        components[component_id]["options"] = _top_options(counts)
+    return submissions, components
+
+def _array_elements(table: Table, component_id: str):
+    """
+    Returns a table-valued function yielding the elements of a string[] component as a "value" column.
+    """
+    if engine.dialect.name == "postgresql":
+        element = table.c.data[literal(component_id, literal_execute=True)]
+        if data_is_jsonb(table):
+            return func.jsonb_array_elements_text(element).table_valued("value", joins_implicitly=True)
+        # The cast keeps this valid if the column has been migrated to JSONB since the bootstrap looked
+        return func.json_array_elements_text(cast(element, JSON)).table_valued("value", joins_implicitly=True)
+    path = '$."' + component_id.replace('"', '\\"') + '"'
+    return func.json_each(table.c.data, path).table_valued("value", joins_implicitly=True)
+
+def _scan_component(db, table: Table, clauses: List[Any], component: ComponentPlan) -> Dict[str, Any]:
+    """
+    Computes one component's aggregates with SQL over the data column.
+    """
+    stats = _empty_stats(component)
+    if component.stats_kind == "options" and component.output_type == "string[]":
+        elements = _array_elements(table, component.component_id)
+        value = elements.c.value
+        base = select().select_from(table, elements).where(*clauses)
+        stats["count"], stats["distinct"] = db.execute(
+            base.with_only_columns(func.count(distinct(table.c.id)), func.count(distinct(value)))
+        ).one()
+        counts = db.execute(
+            base.with_only_columns(value, func.count()).group_by(value).order_by(func.count().desc(), value).limit(STATS_TOP_VALUES)
+        ).fetchall()
+        stats["options"] = {str(option): count for option, count in counts}
+        return stats
+
+    expression = json_value(table, component.component_id, component.output_type)
+    base = select().select_from(table).where(*clauses, expression.isnot(None))
+    if component.stats_kind == "numeric":
+        count, minimum, maximum, mean = db.execute(base.with_only_columns(
+            func.count(), func.min(expression), func.max(expression), func.avg(expression)
+        )).one()
+        stats.update(count=count, min=minimum, max=maximum, mean=float(mean) if mean is not None else None)
+        if count and component.stats_range is not None:
+            edges = histogram_edges(component.stats_range)
+            index = case(*((expression < edge, i) for i, edge in enumerate(edges[1:])), else_=len(edges) - 1) if len(edges) > 1 else literal(0)
+            for bin_index, bin_count in db.execute(base.with_only_columns(index, func.count()).group_by(index)).fetchall():
+                stats["histogram"][bin_index]["count"] = bin_count
+    elif component.stats_kind == "boolean":
+        for value, count in db.execute(base.with_only_columns(expression, func.count()).group_by(expression)).fetchall():
+            stats["true" if value else "false"] += count
+            stats["count"] += count
+    else:
+        stats["count"], stats["distinct"] = db.execute(
+            base.with_only_columns(func.count(), func.count(distinct(expression)))
+        ).one()
+        counts = db.execute(
+            base.with_only_columns(expression, func.count()).group_by(expression).order_by(func.count().desc(), expression).limit(STATS_TOP_VALUES)
+        ).fetchall()
+        stats["options"] = {option: count for option, count in counts}
+    return stats
+
+def scan_stats(db, plan: SubmissionPlan, table: Table, clauses: List[Any]) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+    """
+    Computes a template's aggregates over the rows matching clauses, one aggregate query per component.
+
+    Args:
+        db: A synchronous session.
+        plan: The template's compiled submission plan.
+        table: The template's submissions table.
+        clauses: WHERE clauses, starting with the template's scope (see build_filter_clauses).
+
+    Returns:
+        The number of matching submissions and the stats of each aggregated component, keyed by componentID.
+    """
+    submissions = db.execute(select(func.count()).select_from(table).where(*clauses)).scalar()
+    components = {
+        component.component_id: _scan_component(db, table, clauses, component)
+        for component in plan.stats_components
+    }
+    return submissions, components
+
+def rebuild_summary(conn, plan: SubmissionPlan, table: Table, batch_size: int) -> int:
+    """
+    Replaces a template's summary rows with aggregates recomputed from its stored submissions.
+
+    Returns:
+        The number of submissions summarized.
+    """
+    conn.execute(delete(stats_table).where(stats_table.c.template == plan.template_name))
+    deltas: Dict[Tuple[str, str, str, str], List[Any]] = {}
+    clauses = template_clauses(table, plan.template_name)
+    submissions = 0
+    last_id = None
+    while True:
+        stmt = select(table.c.id, *data_columns(table)).where(*clauses).order_by(table.c.id).limit(batch_size)
+        if last_id is not None:
+            stmt = stmt.where(table.c.id > last_id)
+        rows = conn.execute(stmt).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            summarize(plan, row_data(row) or {}, deltas)
+        submissions += len(rows)
+        last_id = rows[-1].id
+    apply_deltas(conn, deltas, shard=0)
+    return submissions
@@ -1,25 +1,119 @@
+import hashlib
 import logging
+import os
+from dataclasses import dataclass
 from typing import Dict, List, Any, Optional
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 
-from app.config import load_config
+from app.registry import ConfigRegistry, registry
+from app.responses import dumps
 
 logger = logging.getLogger(__name__)
 
-# Define configuration file paths
-COMPONENTS_CONFIG_FILE = "components_config.json"
-TEMPLATES_FILE = "templates.json"
+# Cache-Control header sent with every catalog response
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=60")
 
-components_config = load_config(COMPONENTS_CONFIG_FILE)
-templates_data = load_config(TEMPLATES_FILE)
+@dataclass(frozen=True)
+class CatalogEntry:
+    """A pre-rendered JSON response body with its strong ETag."""
+    body: bytes
+    etag: str
 
-def get_all_templates():
+@dataclass(frozen=True)
+class Catalog:
+    """Every template and component response, rendered once from the configuration."""
+    templates: CatalogEntry
+    template_by_name: Dict[str, CatalogEntry]
+    schema_by_name: Dict[str, CatalogEntry]
+    components: CatalogEntry
+    component_by_name: Dict[str, CatalogEntry]
+
+def render_entry(content: Any) -> CatalogEntry:
+    """
+    Serializes content once and derives a strong ETag from the bytes.
+    """
+    body = dumps(content)
+    return CatalogEntry(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+def build_catalog(config_registry: ConfigRegistry) -> Catalog:
+    """
+    Pre-renders all catalog responses for the given configuration.
+    
+    Args:
+        config_registry: The registry holding the parsed templates and components.
+        
+    Returns:
+        The rendered Catalog.
+    """
+    templates = config_registry.templates_data
+    components = config_registry.components_config
+    component_by_name = {}
+    for component in components:
+        component_name = component.get("componentName")
+        # The first definition wins, matching the previous linear scan
+        if component_name and component_name not in component_by_name:
+            component_by_name[component_name] = render_entry(component)
+    
+    catalog = Catalog(
+        templates=render_entry(templates),
+        template_by_name={name: render_entry(comps) for name, comps in templates.items()},
+        schema_by_name={
+            name: render_entry(config_registry.get_plan(name).schema)
+            for name in templates
+        },
+        components=render_entry(components),
+        component_by_name=component_by_name,
+    )
+    logger.info("Rendered catalog for %d templates and %d components", len(templates), len(component_by_name))
+    return catalog
+
+catalog = build_catalog(registry)
+
+def refresh_catalog() -> None:
+    """
+    Re-renders the catalog from the current registry and swaps it in with a single assignment.
+    """
+    global catalog
+    catalog = build_catalog(registry)
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Applies the weak comparison used for If-None-Match.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def catalog_response(entry: CatalogEntry, if_none_match: Optional[str] = None) -> Response:
+    """
+    Builds the response for a catalog entry, answering 304 when the client already has it.
+    
+    Args:
+        entry: The pre-rendered catalog entry.
+        if_none_match: The request's If-None-Match header, if any.
+        
+    Returns:
+        A 200 response with the pre-rendered body, or an empty 304 response.
+    """
+    headers = {"ETag": entry.etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def get_all_templates() -> CatalogEntry:
     """
     Returns all templates with their component definitions.
     """
-    return templates_data
+    return catalog.templates
 
-def get_template_by_name(template_name: str):
+def get_template_by_name(template_name: str) -> CatalogEntry:
     """
     Returns a specific template by name.
     
@@ -27,17 +121,18 @@ def get_template_by_name(template_name: str):
         template_name: The name of the template to retrieve.
         
     Returns:
-        The template configuration if found.
+        The pre-rendered template configuration if found.
         
     Raises:
         HTTPException: If the template is not found.
     """
-    if template_name not in templates_data:
+    entry = catalog.template_by_name.get(template_name)
+    if entry is None:
         raise HTTPException(status_code=404, detail=f"Template '{template_name}' not found")
     
-    return templates_data[template_name]
+    return entry
 
-def get_template_schema(template_name: str):
+def get_template_schema(template_name: str) -> CatalogEntry:
     """
     Returns the schema for a specific template.
     
@@ -45,68 +140,24 @@ def get_template_schema(template_name: str):
         template_name: The name of the template to get the schema for.
         
     Returns:
-        A dictionary containing the template schema.
+        The pre-rendered template schema, compiled from the template's submission plan.
         
     Raises:
         HTTPException: If the template is not found.
     """
-    if template_name not in templates_data:
+    entry = catalog.schema_by_name.get(template_name)
+    if entry is None:
         raise HTTPException(status_code=404, detail=f"Template '{template_name}' not found")
     
-    template_components = templates_data[template_name]
-    
-    # Extract component types and required fields
-    components = []
-    required_fields = []
-    
-    for component in template_components:
-        component_name = component.get("componentName")
-        component_id = component.get("componentID")
-        
-        if not component_name or not component_id:
-            continue
-        
-        # Get the output type directly from the template component
-        output_type = component.get("output", {}).get("type", "none")
-        
-        # Skip components with output type "none"
-        if output_type == "none":
-            continue
-        
-        # Determine if the component is required based on validations
-        is_required = False
-        if "validations" in component:
-            for validation in component["validations"]:
-                if validation.get("type") == "required":
-                    is_required = True
-                    break
-        
-        # Add component to the schema with simplified structure
-        components.append({
-            "name": component_name,
-            "type": output_type,
-            "required": is_required,
-            "componentID": component_id
-        })
-        
-        # Add to required fields if necessary
-        if is_required:
-            required_fields.append(component_id)
-    
-    # Construct and return the schema
-    return {
-        "template_name": template_name,
-        "components": components,
-        "required_fields": required_fields
-    }
+    return entry
 
-def get_all_components():
+def get_all_components() -> CatalogEntry:
     """
     Returns all available components.
     """
-    return components_config
+    return catalog.components
 
-def get_component_by_name(component_name: str):
+def get_component_by_name(component_name: str) -> CatalogEntry:
     """
     Returns a specific component by name.
     
@@ -114,14 +165,14 @@ def get_component_by_name(component_name: str):
         component_name: The name of the component to retrieve.
         
     Returns:
-        The component configuration if found.
+        The pre-rendered component configuration if found.
         
     Raises:
         HTTPException: If the component is not found.
     """
-    component = next((c for c in components_config if c.get("componentName") == component_name), None)
+    entry = catalog.component_by_name.get(component_name)
     
-    if not component:
+    if entry is None:
         raise HTTPException(status_code=404, detail=f"Component '{component_name}' not found")
     
-    return component 
\ No newline at end of file
+    return entry 
\ No newline at end of file
@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import math
+import mimetypes
+import os
+import re
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.blobs import blob_store
+from app.ids import uuid7
+from app.metrics import form_metrics
+from app.plans import ComponentPlan
+from app.registry import registry
+from app.responses import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Largest upload accepted for any component, in bytes; a component's maxFileSize can only lower it
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+
+# Leading bytes of the file types whose content is checked, keyed by extension. Each type lists
+# alternative signatures, and a signature is a tuple of (offset, bytes) that must all match.
+FILE_SIGNATURES: Dict[str, Tuple[Tuple[Tuple[int, bytes], ...], ...]] = {
+    "jpg": (((0, b"\xff\xd8\xff"),),),
+    "jpeg": (((0, b"\xff\xd8\xff"),),),
+    "png": (((0, b"\x89PNG\r\n\x1a\n"),),),
+    "gif": (((0, b"GIF87a"),), ((0, b"GIF89a"),)),
+    "webp": (((0, b"RIFF"), (8, b"WEBP")),),
+    "pdf": (((0, b"%PDF-"),),),
+    "wav": (((0, b"RIFF"), (8, b"WAVE")),),
+    "mp3": (((0, b"ID3"),), ((0, b"\xff\xfb"),), ((0, b"\xff\xf3"),), ((0, b"\xff\xf2"),)),
+    "ogg": (((0, b"OggS"),),),
+    "webm": (((0, b"\x1a\x45\xdf\xa3"),),),
+    "mp4": (((4, b"ftyp"),),),
+    "m4a": (((4, b"ftyp"),),),
+    "mov": (((4, b"ftyp"),),),
+    "heic": (((4, b"ftyp"),),),
+}
+
+# Bytes buffered from the start of an upload to check its signature
+SNIFF_BYTES = 12
+
+# Names given to stored uploads: a UUIDv7 and the file type
+UPLOAD_NAME_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.[a-z0-9]{1,16}$")
+
+def _matches_signature(file_type: str, head: bytes) -> bool:
+    """
+    Returns True if the first bytes of a file match its type, or the type has no known signature.
+    """
+    signatures = FILE_SIGNATURES.get(file_type)
+    if signatures is None:
+        return True
+    return any(all(head[offset:offset + len(prefix)] == prefix for offset, prefix in signature) for signature in signatures)
+
+def _upload_component(template_name: str, component_id: str) -> ComponentPlan:
+    """
+    Returns the plan of a component that accepts uploads.
+
+    Raises:
+        HTTPException: 404 if the template or component does not exist or does not take files.
+    """
+    if not registry.has_template(template_name):
+        raise HTTPException(status_code=404, detail=f"Template '{template_name}' not found")
+    component = registry.get_plan(template_name).components_by_id.get(component_id)
+    if component is None or not component.accepts_uploads:
+        raise HTTPException(status_code=404, detail=f"Component '{component_id}' of {template_name} does not accept uploads")
+    return component
+
+def _file_type(filename: Optional[str], content_type: Optional[str]) -> str:
+    """
+    Returns the lowercase file type of an upload: the file name's extension, else the one implied by its Content-Type.
+    """
+    if filename and "." in filename:
+        return filename.rsplit(".", 1)[-1].lower()
+    if content_type:
+        extension = mimetypes.guess_extension(content_type.split(";", 1)[0].strip().lower())
+        if extension:
+            return extension.lstrip(".")
+    raise HTTPException(status_code=400, detail="Pass the file name as ?filename= or send a specific Content-Type")
+
+async def save_upload(template_name: str, component_id: str, filename: Optional[str], request: Request) -> FastJSONResponse:
+    """
+    Streams a request body into the blob store as a file for a form component.
+
+    The body is never held in memory: each chunk is counted, hashed and written as it arrives. The
+    file type must be one the component allows, and for known types the first bytes must match
+    it. A body larger than the component's maxFileSize (capped at UPLOAD_MAX_BYTES) is rejected
+    as soon as the limit is crossed, and the partial file is removed.
+
+    Args:
+        template_name: The name of the template.
+        component_id: The component the file is for.
+        filename: The client's name for the file, used for its type.
+        request: The incoming request, read as a raw (possibly chunked) body.
+
+    Returns:
+        A response with the reference to submit as (part of) the component's value.
+    """
+    component = _upload_component(template_name, component_id)
+    file_type = _file_type(filename, request.headers.get("content-type"))
+    if component.upload_types is not None and file_type not in component.upload_types:
+        raise HTTPException(status_code=415, detail=f"File type must be one of {', '.join(sorted(component.upload_types))}")
+    limit = min(component.upload_max_bytes if component.upload_max_bytes is not None else math.inf, UPLOAD_MAX_BYTES)
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail=f"File exceeds the maximum size of {limit:g} bytes")
+
+    digest = hashlib.sha256()
+
+    async def checked_chunks() -> AsyncIterator[bytes]:
+        received = 0
+        head = b""
+        async for chunk in request.stream():
+            if not chunk:
+                continue
+            received += len(chunk)
+            if received > limit:
+                raise HTTPException(status_code=413, detail=f"File exceeds the maximum size of {limit:g} bytes")
+            if len(head) < SNIFF_BYTES:
+                head = (head + chunk)[:SNIFF_BYTES]
+                if len(head) == SNIFF_BYTES and not _matches_signature(file_type, head):
+                    raise HTTPException(status_code=415, detail=f"File content is not {file_type}")
+            digest.update(chunk)
+            yield chunk
+        if received == 0:
+            raise HTTPException(status_code=400, detail="Upload body is empty")
+        if len(head) < SNIFF_BYTES and not _matches_signature(file_type, head):
+            raise HTTPException(status_code=415, detail=f"File content is not {file_type}")
+
+    name = f"{uuid7()}.{file_type}"
+    timings = form_metrics.operation(template_name, "upload")
+    start = time.perf_counter()
+    try:
+        size = await blob_store.save(f"{template_name}/{component_id}/{name}", checked_chunks())
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("event=upload.save_failed template=%s component=%s error=%s", template_name, component_id, e)
+        form_metrics.template(template_name).record_error(e)
+        raise HTTPException(status_code=500, detail=f"Error storing upload: {str(e)}")
+    timings.observe_stage("storage", time.perf_counter() - start)
+
+    logger.debug("event=upload.saved template=%s component=%s name=%s size=%d", template_name, component_id, name, size)
+    return FastJSONResponse({
+        "message": f"{template_name} file uploaded",
+        "reference": f"/forms/{template_name}/uploads/{component_id}/{name}",
+        "size": size,
+        "type": file_type,
+        "sha256": digest.hexdigest()
+    })
+
+async def upload_endpoint(request: Request,
+                          template_name: str = Path(..., description="Name of the form template"),
+                          component_id: str = Path(..., description="Component the file is for"),
+                          filename: Optional[str] = Query(None, description="Original file name; its extension is the file type")):
+    """
+    Uploads one file for a form component as the raw request body, returning a reference to submit.
+    """
+    return await save_upload(template_name, component_id, filename, request)
+
+async def download_endpoint(template_name: str = Path(..., description="Name of the form template"),
+                            component_id: str = Path(..., description="Component the file was uploaded for"),
+                            name: str = Path(..., description="Name from the upload's reference")):
+    """
+    Streams an uploaded file back.
+    """
+    chunks = None
+    if registry.has_template(template_name) and UPLOAD_NAME_PATTERN.match(name):
+        chunks = await blob_store.open(f"{template_name}/{component_id}/{name}")
+    if chunks is None:
+        raise HTTPException(status_code=404, detail=f"Upload {name} not found")
+    return StreamingResponse(chunks, media_type=mimetypes.guess_type(name)[0] or "application/octet-stream")
@@ -0,0 +1,313 @@
+import logging
+import re
+from datetime import date, datetime
+from typing import Annotated, Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from pydantic import AfterValidator, Field
+
+logger = logging.getLogger(__name__)
+
+# E.164: a leading +, then up to 15 digits with no leading zero
+E164_PATTERN = re.compile(r"^\+[1-9]\d{1,14}$")
+PHONE_SEPARATORS = re.compile(r"[\s\-().]")
+DATA_URI_PATTERN = re.compile(r"^data:([\w.+-]+)/([\w.+-]+)?(;[^,]*)?,")
+
+# Rules that cannot be checked from the submitted value alone and are left to the client
+CLIENT_ONLY_RULES = frozenset({"maxDuration"})
+
+# Rules that mark a component as holding files, so it accepts uploads
+FILE_RULES = frozenset({"allowedFileTypes", "fileFormat", "maxFileSize", "minImages", "maxImages", "maxDuration"})
+
+# Output types whose values can be upload references (strings, or lists of them)
+UPLOAD_OUTPUT_TYPES = frozenset({"string", "string[]", "array"})
+
+Constraints = Dict[str, Any]
+Validators = List[Callable[[Any], Any]]
+
+def _param(rule: Dict[str, Any], component: Dict[str, Any], rule_keys: Sequence[str], attribute_names: Sequence[str]) -> Any:
+    """
+    Returns a rule parameter from the validation entry itself, falling back to the component's attributes.
+    """
+    for key in rule_keys:
+        if rule.get(key) is not None:
+            return rule[key]
+    for attribute in component.get("attributes", []):
+        if attribute.get("name") in attribute_names and attribute.get("value") is not None:
+            return attribute["value"]
+    return None
+
+def _number(value: Any, rule: Dict[str, Any], component: Dict[str, Any]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(
+            f"Validation '{rule.get('type')}' on component {component.get('componentID')} has a non-numeric value {value!r}"
+        )
+
+def _tighten(constraints: Constraints, key: str, value: Optional[float]) -> None:
+    """
+    Adds a bound, keeping the stricter one if the key is already constrained.
+    """
+    if value is None:
+        return
+    if key in ("min_length", "max_length"):
+        value = int(value)
+    if key not in constraints:
+        constraints[key] = value
+    elif key in ("ge", "min_length"):
+        constraints[key] = max(constraints[key], value)
+    else:
+        constraints[key] = min(constraints[key], value)
+
+def _file_types(value: Any) -> FrozenSet[str]:
+    if isinstance(value, str):
+        value = value.split(",")
+    return frozenset(str(item).strip().lower().lstrip(".") for item in value if str(item).strip())
+
+def _file_type(item: str) -> str:
+    """
+    Returns the lowercase file type of a data URI (its MIME subtype) or of a path/URL (its extension).
+    """
+    match = DATA_URI_PATTERN.match(item)
+    if match:
+        return (match.group(2) or "").lower()
+    path = item.split("?", 1)[0].split("#", 1)[0]
+    name = path.rsplit("/", 1)[-1]
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+def _payload_size(item: Any) -> Optional[int]:
+    """
+    Returns the size in bytes of an uploaded item when it can be known from the value, else None.
+    """
+    if isinstance(item, dict) and isinstance(item.get("size"), (int, float)):
+        return int(item["size"])
+    if isinstance(item, str) and item.startswith("data:") and ";base64," in item[:128]:
+        encoded = item.split(",", 1)[1]
+        return len(encoded) * 3 // 4 - encoded[-2:].count("=")
+    return None
+
+def _each(value: Any) -> List[Any]:
+    return value if isinstance(value, list) else [value]
+
+def _is_list(output_type: str) -> bool:
+    return output_type == "array" or output_type.endswith("[]")
+
+def _compile_required(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    # Presence is enforced by the template model; mandatory strings and lists must also be non-empty
+    if output_type == "string" or _is_list(output_type):
+        _tighten(constraints, "min_length", 1)
+
+def _compile_min(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    bound = _number(_param(rule, component, ("value", "min"), ()), rule, component)
+    _tighten(constraints, "ge" if output_type == "number" else "min_length", bound)
+
+def _compile_max(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    bound = _number(_param(rule, component, ("value", "max"), ()), rule, component)
+    _tighten(constraints, "le" if output_type == "number" else "max_length", bound)
+
+def _compile_range(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    _tighten(constraints, "ge", _number(_param(rule, component, ("min", "minValue"), ("minValue",)), rule, component))
+    _tighten(constraints, "le", _number(_param(rule, component, ("max", "maxValue"), ("maxValue",)), rule, component))
+
+def _compile_step(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    step = _number(_param(rule, component, ("value", "step"), ("step",)), rule, component)
+    if not step:
+        return
+    origin = _number(_param(rule, component, ("min", "minValue"), ("minValue",)), rule, component) or 0.0
+
+    def check_step(value: float) -> float:
+        steps = (value - origin) / step
+        if abs(steps - round(steps)) > 1e-9:
+            raise ValueError(f"value must be a multiple of {step:g} from {origin:g}")
+        return value
+    validators.append(check_step)
+
+def _compile_max_length(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    _tighten(constraints, "max_length", _number(_param(rule, component, ("value", "maxLength"), ("maxLength",)), rule, component))
+
+def _compile_pattern(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    pattern = _param(rule, component, ("value", "pattern"), ("pattern",))
+    if not pattern:
+        return
+    compiled = re.compile(pattern)
+
+    def check_pattern(value: Any) -> Any:
+        for item in _each(value):
+            if isinstance(item, str) and compiled.search(item) is None:
+                raise ValueError(f"value does not match the pattern {pattern}")
+        return value
+    validators.append(check_pattern)
+
+def _check_phone(value: Any) -> Any:
+    for item in _each(value):
+        if isinstance(item, str) and not E164_PATTERN.match(PHONE_SEPARATORS.sub("", item)):
+            raise ValueError("value is not a valid phone number in E.164 format")
+    return value
+
+def _compile_phone_format(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    validators.append(_check_phone)
+
+def _parse_date(text: str) -> date:
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return datetime.fromisoformat(text).date()
+
+def _compile_valid_date(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    min_date = _param(rule, component, ("min", "minDate"), ("minDate",))
+    max_date = _param(rule, component, ("max", "maxDate"), ("maxDate",))
+    try:
+        earliest = _parse_date(min_date) if min_date else None
+        latest = _parse_date(max_date) if max_date else None
+    except ValueError:
+        raise ValueError(f"Validation 'validDate' on component {component.get('componentID')} has an invalid date bound")
+
+    def check_date(value: Any) -> Any:
+        for item in _each(value):
+            if not isinstance(item, str):
+                continue
+            try:
+                parsed = _parse_date(item)
+            except ValueError:
+                raise ValueError("value is not a valid ISO 8601 date")
+            if earliest is not None and parsed < earliest:
+                raise ValueError(f"date must not be before {earliest.isoformat()}")
+            if latest is not None and parsed > latest:
+                raise ValueError(f"date must not be after {latest.isoformat()}")
+        return value
+    validators.append(check_date)
+
+def _compile_max_selection(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    _tighten(constraints, "max_length", _number(_param(rule, component, ("value", "maxSelection"), ("maxSelection",)), rule, component))
+
+def _compile_min_images(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    _tighten(constraints, "min_length", _number(_param(rule, component, ("value", "minImages"), ("minImages",)), rule, component))
+
+def _compile_max_images(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    _tighten(constraints, "max_length", _number(_param(rule, component, ("value", "maxImages"), ("maxImages",)), rule, component))
+
+def _compile_file_types(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    allowed = _param(rule, component, ("value", "types", "formats"), ("allowedFileTypes", "fileFormats", "allowedFormats"))
+    if not allowed:
+        return
+    allowed = _file_types(allowed)
+    listed = ", ".join(sorted(allowed))
+
+    def check_file_types(value: Any) -> Any:
+        for item in _each(value):
+            if isinstance(item, str) and _file_type(item) not in allowed:
+                raise ValueError(f"file type must be one of {listed}")
+        return value
+    validators.append(check_file_types)
+
+def _compile_max_file_size(rule, component, output_type, constraints: Constraints, validators: Validators) -> None:
+    limit = _number(_param(rule, component, ("value", "maxFileSize"), ("maxFileSize",)), rule, component)
+    if limit is None:
+        return
+
+    def check_file_size(value: Any) -> Any:
+        for item in _each(value):
+            size = _payload_size(item)
+            if size is not None and size > limit:
+                raise ValueError(f"file exceeds the maximum size of {limit:g} bytes")
+        return value
+    validators.append(check_file_size)
+
+def upload_rules(component: Dict[str, Any], output_type: str) -> Tuple[bool, Optional[FrozenSet[str]], Optional[float]]:
+    """
+    Returns whether a component accepts uploaded files, and the file types and size they are limited to.
+
+    Components with a file rule (allowedFileTypes, maxFileSize, minImages, ...) accept uploads;
+    ``"uploads": true`` or ``"uploads": false`` on the component overrides that. The limits come
+    from the same rules as for submitted values: the intersection of the allowed file types and
+    the smallest maxFileSize, either of which may be None for no limit.
+    """
+    rules = component.get("validations", [])
+    accepts = component.get("uploads")
+    if accepts is None:
+        accepts = any(rule.get("type") in FILE_RULES for rule in rules)
+    if not accepts or output_type not in UPLOAD_OUTPUT_TYPES:
+        return False, None, None
+    allowed_types: Optional[FrozenSet[str]] = None
+    max_size: Optional[float] = None
+    for rule in rules:
+        if rule.get("type") in ("allowedFileTypes", "fileFormat"):
+            allowed = _param(rule, component, ("value", "types", "formats"), ("allowedFileTypes", "fileFormats", "allowedFormats"))
+            if allowed:
+                allowed_types = _file_types(allowed) if allowed_types is None else allowed_types & _file_types(allowed)
+        elif rule.get("type") == "maxFileSize":
+            limit = _number(_param(rule, component, ("value", "maxFileSize"), ("maxFileSize",)), rule, component)
+            if limit is not None:
+                max_size = limit if max_size is None else min(max_size, limit)
+    return True, allowed_types, max_size
+
+# Compilers for the rule types used in the "validations" of templates and components
+RULE_COMPILERS: Dict[str, Callable[..., None]] = {
+    "required": _compile_required,
+    "min": _compile_min,
+    "max": _compile_max,
+    "range": _compile_range,
+    "step": _compile_step,
+    "maxLength": _compile_max_length,
+    "pattern": _compile_pattern,
+    "phoneFormat": _compile_phone_format,
+    "validDate": _compile_valid_date,
+    "maxSelection": _compile_max_selection,
+    "minImages": _compile_min_images,
+    "maxImages": _compile_max_images,
+    "allowedFileTypes": _compile_file_types,
+    "fileFormat": _compile_file_types,
+    "maxFileSize": _compile_max_file_size,
+}
+
+def compile_validations(component: Dict[str, Any], output_type: str) -> Tuple[Constraints, Validators]:
+    """
+    Compiles a component's validation rules into Pydantic field constraints and value validators.
+
+    Rule parameters are read from the validation entry ("value", or a named key such as "maxLength")
+    and otherwise from the component attribute of the same name. Rules without a parameter, and
+    rules that cannot be checked server-side, are skipped.
+
+    Args:
+        component: The component configuration from the template.
+        output_type: The component's output type.
+
+    Returns:
+        Keyword arguments for pydantic.Field, and validators to run after type validation.
+
+    Raises:
+        ValueError: If a rule has a malformed parameter (a non-numeric bound or an invalid date).
+        re.error: If a pattern rule has an invalid regular expression.
+    """
+    constraints: Constraints = {}
+    validators: Validators = []
+    for rule in component.get("validations", []):
+        rule_type = rule.get("type")
+        compiler = RULE_COMPILERS.get(rule_type)
+        if compiler is None:
+            if rule_type not in CLIENT_ONLY_RULES:
+                logger.debug("event=validation.unsupported component=%s rule=%s", component.get("componentID"), rule_type)
+            continue
+        compiler(rule, component, output_type, constraints, validators)
+    return constraints, validators
+
+def build_value_annotation(component: Dict[str, Any], output_type: str, python_type: Any) -> Any:
+    """
+    Returns the annotation for a component's "value" field with its validations applied.
+
+    Args:
+        component: The component configuration from the template.
+        output_type: The component's output type.
+        python_type: The Python type for the output type.
+
+    Returns:
+        python_type, or an Annotated type carrying the compiled constraints and validators.
+    """
+    constraints, validators = compile_validations(component, output_type)
+    if not constraints and not validators:
+        return python_type
+    metadata = [Field(**constraints)] if constraints else []
+    metadata.extend(AfterValidator(validator) for validator in validators)
+    return Annotated[(python_type, *metadata)]
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import Table, insert
+
+from app.compression import stored_values
+from app.database import run_in_transaction
+from app.plans import SubmissionPlan
+from app.stats import record_submissions
+
+logger = logging.getLogger(__name__)
+
+# Queue single submissions in memory and commit them in groups instead of one transaction each
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+# Submissions waiting to be written before new ones are rejected with 429
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+# Largest number of submissions committed in one transaction
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+# How long the flusher waits for a group to fill up, in milliseconds
+WRITE_BEHIND_MAX_DELAY_MS = float(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "5"))
+
+class WriteBehindFull(Exception):
+    """Raised when the queue is at capacity (or shutting down) and a submission cannot be accepted."""
+
+class _PendingWrite(NamedTuple):
+    plan: SubmissionPlan
+    table: Table
+    row: Dict[str, Any]
+    future: asyncio.Future
+
+def _insert_group(conn, table: Table, group: List[_PendingWrite]) -> None:
+    conn.execute(insert(table), [{**pending.row, **stored_values(pending.plan, pending.row["data"])} for pending in group])
+    record_submissions(conn, [(pending.plan, pending.row["data"]) for pending in group])
+
+class WriteBehindQueue:
+    """
+    Bounded in-process queue that commits submissions in groups.
+
+    A single background task takes whatever is queued (waiting up to max_delay for a group to
+    form), inserts it with one executemany per table and commits. Each submitter awaits its
+    group's commit, so a client is only acknowledged once its row is durable.
+    """
+
+    def __init__(self, capacity: int = WRITE_BEHIND_QUEUE_SIZE, max_batch: int = WRITE_BEHIND_MAX_BATCH,
+                 max_delay: float = WRITE_BEHIND_MAX_DELAY_MS / 1000):
+        self.capacity = capacity
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = True
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.groups = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return not self._closed
+
+    def start(self) -> None:
+        """
+        Starts the flusher task on the running event loop.
+        """
+        self._queue = asyncio.Queue(maxsize=self.capacity)
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, plan: SubmissionPlan, table: Table, row: Dict[str, Any]) -> None:
+        """
+        Queues a row and waits until the transaction containing it has committed.
+
+        The row is written with the given plan even if a reload changes or removes its template
+        before the group commits.
+
+        Raises:
+            WriteBehindFull: If the queue is full or draining.
+            Exception: Whatever the group's insert raised.
+        """
+        if self._closed:
+            raise WriteBehindFull("Write-behind queue is shutting down")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(_PendingWrite(plan, table, row, future))
+        except asyncio.QueueFull:
+            with self._lock:
+                self.rejected += 1
+            raise WriteBehindFull("Write-behind queue is full")
+        with self._lock:
+            self.accepted += 1
+        # Shield the write from request cancellation; the row is committed either way
+        await asyncio.shield(future)
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if self.max_delay > 0 and queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _flush(self, batch: List[_PendingWrite]) -> None:
+        """
+        Commits a batch with one transaction per table and resolves the submitters' futures.
+
+        With the shared storage layout every template's rows go into the same transaction.
+        """
+        groups: Dict[str, List[_PendingWrite]] = {}
+        for pending in batch:
+            groups.setdefault(pending.table.name, []).append(pending)
+
+        for group in groups.values():
+            table = group[0].table
+            try:
+                await run_in_transaction(_insert_group, table, group)
+            except Exception as e:
+                logger.error("event=write_behind.flush_failed table=%s rows=%d error=%s", table.name, len(group), e)
+                with self._lock:
+                    self.failed += len(group)
+                for pending in group:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                continue
+            with self._lock:
+                self.groups += 1
+            logger.debug("event=write_behind.flushed table=%s rows=%d", table.name, len(group))
+            for pending in group:
+                if not pending.future.done():
+                    pending.future.set_result(None)
+
+    async def drain(self) -> None:
+        """
+        Stops accepting submissions, waits for everything queued to be committed and stops the flusher.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        logger.info("event=write_behind.drained accepted=%d failed=%d", self.accepted, self.failed)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the queue's configuration, depth and counters for this worker.
+        """
+        with self._lock:
+            return {
+                "enabled": WRITE_BEHIND,
+                "running": self.running,
+                "depth": self._queue.qsize() if self._queue is not None else 0,
+                "capacity": self.capacity,
+                "max_batch": self.max_batch,
+                "max_delay_ms": self.max_delay * 1000,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "groups_committed": self.groups,
+                "failed": self.failed,
+            }
+
+# Process-wide queue, started at startup when WRITE_BEHIND is enabled
+write_behind = WriteBehindQueue()
@@ -0,0 +1,69 @@
+"""
+Per-route JSON encode cost, before and after the orjson response path.
+
+"before" reproduces FastAPI's default handling of a returned dict: response_model=dict validation
+(form routes only), jsonable_encoder and Starlette's stdlib JSONResponse. "after" is FastJSONResponse.
+Template and component routes now serve bytes pre-rendered at startup, so their per-request cost is
+lower still; the numbers show what rendering them on each request would cost.
+
+Usage:
+    python -m benchmarks.bench_json_responses [--number 2000]
+"""
+import argparse
+import timeit
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.responses import FastJSONResponse, orjson
+from app.registry import registry
+
+dict_adapter = TypeAdapter(dict)
+
+def build_route_payloads():
+    """
+    Returns (route, payload, had_response_model) for every route family.
+    """
+    templates_data = registry.templates_data
+    components_config = registry.components_config
+    template_name = next(iter(templates_data))
+    submission_id = str(uuid.uuid4())
+    stored = {"text-input-1": "some answer", "selection-1": ["0", "1", "2"], "slider-1": 42.0}
+    return [
+        ("GET /templates", templates_data, False),
+        ("GET /templates/{name}", templates_data[template_name], False),
+        ("GET /templates/{name}/schema", registry.get_plan(template_name).schema, False),
+        ("GET /components", components_config, False),
+        ("GET /components/{name}", components_config[0], False),
+        ("POST /forms/{name}", {"message": "submitted successfully", "submission_id": submission_id, "data": stored}, True),
+        ("GET /forms/{name}/{id}", {"message": "Retrieved form", "submission_id": submission_id,
+                                     "data": {k: {"value": v} for k, v in stored.items()}}, True),
+    ]
+
+def encode_before(payload, had_response_model: bool) -> bytes:
+    if had_response_model:
+        payload = dict_adapter.validate_python(payload)
+    return JSONResponse(jsonable_encoder(payload)).body
+
+def encode_after(payload, had_response_model: bool) -> bytes:
+    return FastJSONResponse(payload).body
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="Encodes per measurement")
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if orjson is not None else 'stdlib json (orjson not installed)'}")
+    print(f"{'route':32} {'bytes':>8} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    for route, payload, had_response_model in build_route_payloads():
+        size = len(encode_after(payload, had_response_model))
+        before = min(timeit.repeat(lambda: encode_before(payload, had_response_model), number=args.number, repeat=3))
+        after = min(timeit.repeat(lambda: encode_after(payload, had_response_model), number=args.number, repeat=3))
+        before_us = before / args.number * 1e6
+        after_us = after / args.number * 1e6
+        print(f"{route:32} {size:>8} {before_us:>10.2f} {after_us:>10.2f} {before_us / after_us:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
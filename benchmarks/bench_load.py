@@ -0,0 +1,165 @@
+"""
+In-process ASGI load test of the form and template routes.
+
+For each template count, a synthetic configuration is written (see benchmarks.synthetic) and the
+application is started in a fresh subprocess against an empty database. Requests go through
+httpx.ASGITransport, so the numbers cover routing, validation, the database and serialization,
+but no network or server overhead. Scenarios:
+
+    submit    POST /forms/<template> with a valid payload, cycling through the templates
+    fetch     GET /forms/<template>/<id> for the submissions just created
+    template  GET /templates/<template>
+    catalog   GET /templates (the whole catalog, so it grows with the template count)
+
+The database defaults to a new SQLite file per run; pass --database-url to use a local Postgres
+server instead (its tables are created, not dropped). Other settings, e.g. ROUTING_MODE,
+LAZY_TEMPLATES or SUBMISSION_CACHE_BYTES, are taken from the environment. Needs httpx.
+
+Usage:
+    python -m benchmarks.bench_load [--templates 10,100,1000] [--requests 2000] [--concurrency 32]
+                                    [--database-url URL]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+async def run_scenario(client, requests: List[Any], concurrency: int) -> Dict[str, Any]:
+    """
+    Sends (method, url, body) requests with concurrency workers and summarizes their latencies.
+    """
+    latencies: List[float] = []
+    responses: List[Any] = [None] * len(requests)
+    errors = 0
+    position = 0
+
+    async def worker():
+        nonlocal errors, position
+        while position < len(requests):
+            index = position
+            method, url, body = requests[index]
+            position += 1
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            responses[index] = response
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "responses": responses,
+    }
+
+async def run_child(payloads_file: str, request_count: int, concurrency: int) -> None:
+    """
+    Starts the application in this process, runs every scenario and prints one JSON line per scenario.
+    """
+    import httpx
+
+    start = time.perf_counter()
+    from app.main import app
+    from app.database import engine, USE_ASYNC_DB
+    await app.router.startup()
+    print(json.dumps({"scenario": "startup", "seconds": time.perf_counter() - start}), flush=True)
+
+    with open(payloads_file, encoding="utf-8") as f:
+        payloads = json.load(f)
+    template_names = list(payloads)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            submits = [
+                ("POST", f"/forms/{name}", payloads[name])
+                for name in (template_names[i % len(template_names)] for i in range(request_count))
+            ]
+            result = await run_scenario(client, submits, concurrency)
+            created = [
+                (request[1], response.json()["submission_id"])
+                for request, response in zip(submits, result.pop("responses"))
+                if response.status_code == 200
+            ]
+            print(json.dumps({"scenario": "submit", **result}), flush=True)
+
+            fetches = [("GET", f"{path}/{submission_id}", None) for path, submission_id in created]
+            result = await run_scenario(client, fetches or [("GET", "/forms/missing/0", None)], concurrency)
+            result.pop("responses")
+            print(json.dumps({"scenario": "fetch", **result}), flush=True)
+
+            templates = [("GET", f"/templates/{template_names[i % len(template_names)]}", None) for i in range(request_count)]
+            result = await run_scenario(client, templates, concurrency)
+            result.pop("responses")
+            print(json.dumps({"scenario": "template", **result}), flush=True)
+
+            catalog = [("GET", "/templates", None)] * max(1, request_count // 10)
+            result = await run_scenario(client, catalog, concurrency)
+            result.pop("responses")
+            print(json.dumps({"scenario": "catalog", **result}), flush=True)
+    finally:
+        await app.router.shutdown()
+        if USE_ASYNC_DB:
+            await engine.dispose()
+
+def run_parent(args: argparse.Namespace) -> None:
+    """
+    Runs one subprocess per template count and prints a table of the results.
+    """
+    from benchmarks.synthetic import write_config
+
+    print(f"{'templates':>9} {'scenario':10} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (int(value) for value in args.templates.split(",")):
+            templates_path, payloads_path = write_config(count, directory)
+            env = {
+                **os.environ,
+                "TEMPLATES_FILE": templates_path,
+                "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(directory, f'bench-{count}.db')}",
+                "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+            }
+            process = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_load", "--child", payloads_path,
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                env=env, capture_output=True, text=True
+            )
+            if process.returncode != 0:
+                print(process.stderr, file=sys.stderr)
+                raise SystemExit(f"Load test with {count} templates failed")
+            for line in process.stdout.splitlines():
+                result = json.loads(line)
+                if result["scenario"] == "startup":
+                    print(f"{count:>9} {'startup':10} {result['seconds']:.2f} s")
+                else:
+                    print(f"{count:>9} {result['scenario']:10} {result['requests']:>8} {result['errors']:>6} "
+                          f"{result['rps']:>9.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--templates", default="10,100,1000", help="Comma-separated template counts")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario (a tenth of that for the catalog)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight")
+    parser.add_argument("--database-url", help="Database to load instead of a temporary SQLite file")
+    parser.add_argument("--child", metavar="PAYLOADS_FILE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(run_child(args.child, args.requests, args.concurrency))
+    else:
+        run_parent(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmarks for the startup and per-request work of the form and catalog routes.
+
+"startup" builds synthetic configurations of 10 to 1000 templates (see benchmarks.synthetic) and
+measures the one-off work that grows with the number of templates: creating every template model
+and plan, and pre-rendering the catalog served by /templates and /components.
+
+"per request" measures, for each distinct template, the CPU work a single request does outside the
+database: validating the JSON body against the template model, the POST transform (model_dump and
+projection onto the output components), encoding the POST response and rendering the GET response.
+
+Usage:
+    python -m benchmarks.bench_micro [--templates 10,100,1000] [--number 20000]
+"""
+import argparse
+import tempfile
+import time
+import timeit
+import uuid
+
+from app.registry import ConfigRegistry, COMPONENTS_CONFIG_FILE
+from app.responses import FastJSONResponse, dumps
+from app.template_endpoints import build_catalog
+from benchmarks.synthetic import base_templates, write_config
+
+def measure_startup(count: int, directory: str):
+    """
+    Returns (model and plan build seconds, catalog render seconds, /templates body bytes) for count templates.
+    """
+    templates_path, _ = write_config(count, directory)
+    config_registry = ConfigRegistry(templates_path, COMPONENTS_CONFIG_FILE)
+    start = time.perf_counter()
+    config_registry.build_all()
+    built = time.perf_counter()
+    catalog = build_catalog(config_registry)
+    rendered = time.perf_counter()
+    return built - start, rendered - built, len(catalog.templates.body)
+
+def per_request_cases(directory: str):
+    """
+    Returns (label, fields, operations) for each distinct template, operations being (name, callable) pairs.
+    """
+    bases = base_templates()
+    templates_path, _ = write_config(len(bases), directory)
+    config_registry = ConfigRegistry(templates_path, COMPONENTS_CONFIG_FILE)
+    cases = []
+    for (label, _, payload), template_name in zip(bases, config_registry.templates_data):
+        model = config_registry.get_template_model(template_name)
+        plan = config_registry.get_plan(template_name)
+        body = dumps(payload)
+        form_data = model.model_validate_json(body)
+        data = plan.project_submission(form_data.model_dump())
+        submission_id = str(uuid.uuid4())
+        operations = [
+            ("validate", lambda model=model, body=body: model.model_validate_json(body)),
+            ("transform", lambda plan=plan, form_data=form_data: plan.project_submission(form_data.model_dump())),
+            ("post body", lambda template_name=template_name, data=data: FastJSONResponse({
+                "message": f"{template_name} submitted successfully", "submission_id": submission_id, "data": data}).body),
+            ("get body", lambda template_name=template_name, plan=plan, data=data: FastJSONResponse({
+                "message": f"Retrieved {template_name} form", "submission_id": submission_id, "data": plan.project_stored(data)}).body),
+        ]
+        cases.append((label, len(payload), operations))
+    return cases
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--templates", default="10,100,1000", help="Comma-separated template counts for the startup measurements")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per per-request measurement")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print("startup")
+        print(f"{'templates':>9} {'models ms':>10} {'per tpl us':>11} {'catalog ms':>11} {'/templates KB':>14}")
+        for count in (int(value) for value in args.templates.split(",")):
+            build_seconds, catalog_seconds, catalog_bytes = measure_startup(count, directory)
+            print(f"{count:>9} {build_seconds * 1e3:>10.1f} {build_seconds / count * 1e6:>11.1f} "
+                  f"{catalog_seconds * 1e3:>11.1f} {catalog_bytes / 1024:>14.1f}")
+
+        print()
+        print("per request (us)")
+        cases = per_request_cases(directory)
+        names = [name for name, _ in cases[0][2]]
+        print(f"{'template':12} {'fields':>6} " + " ".join(f"{name:>10}" for name in names))
+        for label, fields, operations in cases:
+            timings = [
+                min(timeit.repeat(operation, number=args.number, repeat=3)) / args.number * 1e6
+                for _, operation in operations
+            ]
+            print(f"{label:12} {fields:>6} " + " ".join(f"{value:>10.2f}" for value in timings))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Per-submission validation cost, with and without the compiled template validations.
+
+"types only" validates output types alone, the way template models did before validations were
+compiled. "compiled" is the current template model, with bounds, lengths, patterns, formats and
+optional components. Each template from templates.json is measured with a generated payload, plus a
+synthetic template that uses every supported rule, with a valid and an invalid payload.
+
+Usage:
+    python -m benchmarks.bench_validation [--number 20000]
+"""
+import argparse
+import timeit
+
+from pydantic import ValidationError
+
+from app.models import create_template_model
+from app.registry import registry
+from benchmarks.synthetic import RULES_TEMPLATE, RULES_VALID, sample_payload
+
+RULES_INVALID = {**RULES_VALID, "distance": {"value": 37}, "photos": {"value": ["https://cdn.example.com/a.gif"]}}
+
+def strip_validations(template_components):
+    """
+    Returns the components with every rule but "required" removed, so only output types are checked.
+    """
+    return [
+        {**component, "validations": [v for v in component.get("validations", []) if v.get("type") == "required"]}
+        for component in template_components
+    ]
+
+def validate(model, payload) -> bool:
+    try:
+        model.model_validate(payload)
+        return True
+    except ValidationError:
+        return False
+
+def build_cases():
+    """
+    Returns (label, types-only model, compiled model, payload) for every measured case.
+    """
+    cases = []
+    for template_name, template_components in registry.templates_data.items():
+        cases.append((
+            template_name,
+            create_template_model(template_name, strip_validations(template_components), {}),
+            create_template_model(template_name, template_components, {}),
+            sample_payload(template_components),
+        ))
+    types_only = create_template_model("rules", strip_validations(RULES_TEMPLATE), {})
+    compiled = create_template_model("rules", RULES_TEMPLATE, {})
+    cases.append(("all rules (valid)", types_only, compiled, RULES_VALID))
+    cases.append(("all rules (invalid)", types_only, compiled, RULES_INVALID))
+    return cases
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="Validations per measurement")
+    args = parser.parse_args()
+
+    print(f"{'template':24} {'fields':>6} {'types us':>9} {'compiled us':>12} {'overhead':>9} {'accepted':>9}")
+    for label, types_only, compiled, payload in build_cases():
+        before = min(timeit.repeat(lambda: validate(types_only, payload), number=args.number, repeat=3))
+        after = min(timeit.repeat(lambda: validate(compiled, payload), number=args.number, repeat=3))
+        before_us = before / args.number * 1e6
+        after_us = after / args.number * 1e6
+        accepted = "yes" if validate(compiled, payload) else "no"
+        print(f"{label:24} {len(payload):>6} {before_us:>9.2f} {after_us:>12.2f} {after_us - before_us:>+8.2f} {accepted:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Synthetic configurations for benchmarks: any number of templates cloned from templates.json, plus a
+template that uses every supported validation rule, each with a payload that passes validation.
+"""
+import copy
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+from app.config import load_config
+
+RULES_TEMPLATE = [
+    {"componentID": "name", "componentName": "Text Input", "output": {"type": "string"},
+     "attributes": [{"name": "maxLength", "value": 40}],
+     "validations": [{"type": "required"}, {"type": "maxLength"}, {"type": "pattern", "value": "^[A-Za-z ]+$"}]},
+    {"componentID": "distance", "componentName": "Slider with Label", "output": {"type": "number"},
+     "attributes": [{"name": "minValue", "value": 0}, {"name": "maxValue", "value": 100}, {"name": "step", "value": 5}],
+     "validations": [{"type": "required"}, {"type": "range"}, {"type": "step"}]},
+    {"componentID": "phone", "componentName": "Phone Input", "output": {"type": "string"},
+     "validations": [{"type": "required"}, {"type": "phoneFormat"}]},
+    {"componentID": "birthday", "componentName": "Date Input", "output": {"type": "string"},
+     "attributes": [{"name": "minDate", "value": "1900-01-01"}, {"name": "maxDate", "value": "2100-12-31"}],
+     "validations": [{"type": "required"}, {"type": "validDate"}]},
+    {"componentID": "interests", "componentName": "Multi Selection", "output": {"type": "string[]"},
+     "attributes": [{"name": "maxSelection", "value": 5}],
+     "validations": [{"type": "required"}, {"type": "maxSelection"}]},
+    {"componentID": "photos", "componentName": "Photo Upload Grid", "output": {"type": "array"},
+     "attributes": [{"name": "maxImages", "value": 6}],
+     "validations": [{"type": "minImages", "value": 1}, {"type": "maxImages"}, {"type": "allowedFileTypes", "value": "jpg,png"},
+                     {"type": "maxFileSize", "value": 5_000_000}]},
+]
+
+RULES_VALID = {
+    "name": {"value": "Ada Lovelace"},
+    "distance": {"value": 35},
+    "phone": {"value": "+44 20 7946 0958"},
+    "birthday": {"value": "1985-12-10"},
+    "interests": {"value": ["math", "poetry"]},
+    "photos": {"value": ["https://cdn.example.com/a.jpg", "https://cdn.example.com/b.png"]},
+}
+
+SAMPLE_VALUES = {
+    "string": "sample",
+    "number": 1.0,
+    "boolean": True,
+    "bool": True,
+    "object": {},
+    "array": ["a", "b"],
+    "string[]": ["0", "1"],
+    "number[]": [1.0, 2.0],
+    "boolean[]": [True],
+    "object[]": [{}],
+}
+
+def sample_payload(template_components: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns a submission with a type-appropriate value for every output component.
+    """
+    return {
+        component["componentID"]: {"value": SAMPLE_VALUES.get(component.get("output", {}).get("type"), "sample")}
+        for component in template_components
+        if component.get("componentID") and component.get("output", {}).get("type", "none") != "none"
+    }
+
+def base_templates(templates_file: str = "templates.json") -> List[Tuple[str, List[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    Returns (name, components, valid payload) for each template in templates_file and the rules template.
+    """
+    bases = [
+        (name, components, sample_payload(components))
+        for name, components in load_config(templates_file).items()
+    ]
+    bases.append(("rules", RULES_TEMPLATE, RULES_VALID))
+    return bases
+
+def build_templates(count: int, templates_file: str = "templates.json") -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Builds count templates by cycling through the base templates.
+
+    Returns:
+        The templates (as in templates.json) and a valid payload for each, both keyed by template name.
+    """
+    bases = base_templates(templates_file)
+    templates = {}
+    payloads = {}
+    for index in range(count):
+        name, components, payload = bases[index % len(bases)]
+        template_name = f"{name}-{index:04d}"
+        templates[template_name] = copy.deepcopy(components)
+        payloads[template_name] = payload
+    return templates, payloads
+
+def write_config(count: int, directory: str, templates_file: str = "templates.json") -> Tuple[str, str]:
+    """
+    Writes a synthetic templates file and the matching payloads to directory.
+
+    Returns:
+        The paths of the templates file and the payloads file.
+    """
+    templates, payloads = build_templates(count, templates_file)
+    templates_path = os.path.join(directory, f"templates-{count}.json")
+    payloads_path = os.path.join(directory, f"payloads-{count}.json")
+    with open(templates_path, "w", encoding="utf-8") as f:
+        json.dump(templates, f)
+    with open(payloads_path, "w", encoding="utf-8") as f:
+        json.dump(payloads, f)
+    return templates_path, payloads_path
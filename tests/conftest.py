@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# The engine is created on import, so point it at a throwaway database first
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/tests.db")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app as fastapi_app
+
+@pytest.fixture
+def client():
+    with TestClient(fastapi_app) as test_client:
+        yield test_client
@@ -0,0 +1,58 @@
+import pytest
+
+import app.compression
+import app.endpoints
+from app.cache import SubmissionCache
+from app.idempotency import IdempotencyCache
+
+LARGE_TEXT = "lorem ipsum dolor sit amet " * 400
+
+@pytest.fixture
+def compression(monkeypatch):
+    monkeypatch.setattr(app.compression, "DATA_COMPRESSION", "zlib")
+    monkeypatch.setattr(app.compression, "DATA_COMPRESSION_MIN_BYTES", 1024)
+
+def test_filter_on_compressible_component_is_rejected(client, compression):
+    response = client.post("/forms/screen-2", json={"text-input-1": {"value": LARGE_TEXT}})
+    assert response.status_code == 200
+
+    params = [("filter", "text-input-1:ne:x")]
+    assert client.get("/forms/screen-2", params=params).status_code == 400
+    assert client.get("/forms/screen-2/export", params=params).status_code == 400
+    assert client.get("/forms/screen-2/stats", params=params + [("source", "scan")]).status_code == 400
+
+def test_compressed_submission_reads_back_whole(client, compression):
+    response = client.post("/forms/screen-2", json={"text-input-1": {"value": LARGE_TEXT}})
+    submission_id = response.json()["submission_id"]
+
+    items = client.get("/forms/screen-2", params={"limit": 500}).json()["items"]
+    listed = next(item for item in items if item["submission_id"] == submission_id)
+    assert listed["data"] == {"text-input-1": {"value": LARGE_TEXT}}
+
+def test_filter_on_any_scalar_component_without_compression(client):
+    response = client.post("/forms/screen-2", json={"text-input-1": {"value": LARGE_TEXT}})
+    submission_id = response.json()["submission_id"]
+
+    response = client.get("/forms/screen-2", params=[("filter", "text-input-1:ne:x"), ("limit", "500")])
+    assert response.status_code == 200
+    assert submission_id in [item["submission_id"] for item in response.json()["items"]]
+
+def test_compressed_submission_reads_back_whole_after_compression_is_unset(client, monkeypatch):
+    monkeypatch.setattr(app.compression, "DATA_COMPRESSION", "zlib")
+    monkeypatch.setattr(app.compression, "DATA_COMPRESSION_MIN_BYTES", 1024)
+    payload = {"text-input-1": {"value": LARGE_TEXT}}
+    response = client.post("/forms/screen-2", json=payload, headers={"Idempotency-Key": "unset-compression"})
+    submission_id = response.json()["submission_id"]
+
+    monkeypatch.setattr(app.compression, "DATA_COMPRESSION", "")
+    # Read from the database rather than the caches filled by the insert
+    monkeypatch.setattr(app.endpoints, "submission_cache", SubmissionCache(max_bytes=0))
+    monkeypatch.setattr(app.endpoints, "idempotency_cache", IdempotencyCache())
+    assert client.get(f"/forms/screen-2/{submission_id}").json()["data"] == payload
+    items = client.get("/forms/screen-2", params={"limit": 500}).json()["items"]
+    assert next(item for item in items if item["submission_id"] == submission_id)["data"] == payload
+    export = client.get("/forms/screen-2/export", params={"format": "ndjson"}).text
+    assert LARGE_TEXT in export
+    replay = client.post("/forms/screen-2", json=payload, headers={"Idempotency-Key": "unset-compression"})
+    assert replay.status_code == 200
+    assert replay.json()["submission_id"] == submission_id
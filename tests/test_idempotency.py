@@ -0,0 +1,76 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+import app.endpoints
+from app.database import engine, get_dynamic_table
+from app.idempotency import IdempotencyCache
+
+TEMPLATE = "screen-2"
+PAYLOAD = {"text-input-1": {"value": "once"}}
+
+def _post(client, key, payload=PAYLOAD):
+    return client.post(f"/forms/{TEMPLATE}", json=payload, headers={"Idempotency-Key": key})
+
+def _rows(key):
+    table = get_dynamic_table(TEMPLATE)
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).where(table.c.idempotency_key == key)).scalar()
+
+def test_replay_returns_the_original_submission(client, monkeypatch):
+    key = str(uuid.uuid4())
+    first = _post(client, key)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+
+    replay = _post(client, key)
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["submission_id"] == first.json()["submission_id"]
+
+    # A worker that has not seen the key finds it through the unique index
+    monkeypatch.setattr(app.endpoints, "idempotency_cache", IdempotencyCache())
+    replay = _post(client, key)
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["submission_id"] == first.json()["submission_id"]
+    assert _rows(key) == 1
+
+def test_key_reused_with_different_data_is_rejected(client, monkeypatch):
+    key = str(uuid.uuid4())
+    first = _post(client, key)
+
+    assert _post(client, key, {"text-input-1": {"value": "twice"}}).status_code == 422
+    monkeypatch.setattr(app.endpoints, "idempotency_cache", IdempotencyCache())
+    assert _post(client, key, {"text-input-1": {"value": "twice"}}).status_code == 422
+    assert _post(client, key).json()["submission_id"] == first.json()["submission_id"]
+    assert _rows(key) == 1
+
+def test_concurrent_posts_with_one_key_store_one_row(client):
+    key = str(uuid.uuid4())
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: _post(client, key), range(8)))
+
+    assert [response.status_code for response in responses] == [200] * 8
+    assert len({response.json()["submission_id"] for response in responses}) == 1
+    assert _rows(key) == 1
+
+def test_insert_that_loses_the_race_replays_the_winner(client, monkeypatch):
+    key = str(uuid.uuid4())
+    winner = _post(client, key)
+
+    # The losing request looked the key up before the winner committed
+    fetch = app.endpoints._fetch_by_idempotency_key
+    lookups = []
+
+    def fetch_after_race(*args):
+        lookups.append(args)
+        return None if len(lookups) == 1 else fetch(*args)
+
+    monkeypatch.setattr(app.endpoints, "_fetch_by_idempotency_key", fetch_after_race)
+    monkeypatch.setattr(app.endpoints, "idempotency_cache", IdempotencyCache())
+    loser = _post(client, key)
+
+    assert len(lookups) == 2
+    assert loser.status_code == 200
+    assert loser.json()["submission_id"] == winner.json()["submission_id"]
+    assert _rows(key) == 1
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+import app.endpoints
+import app.write_behind
+from app.database import engine, get_dynamic_table
+from app.registry import registry
+from app.ids import uuid7
+from app.write_behind import WriteBehindFull, WriteBehindQueue
+
+TEMPLATE = "screen-2"
+
+@pytest.fixture
+def group_sizes(monkeypatch):
+    """
+    Records the number of rows in each group the queue commits.
+    """
+    sizes = []
+    run_in_transaction = app.write_behind.run_in_transaction
+
+    async def recording(fn, table, group):
+        sizes.append(len(group))
+        return await run_in_transaction(fn, table, group)
+
+    monkeypatch.setattr(app.write_behind, "run_in_transaction", recording)
+    return sizes
+
+def _row():
+    return {"submission_id": uuid7(), "data": {"text-input-1": {"value": "queued"}}}
+
+def _count(table, submission_ids):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).where(table.c.submission_id.in_(submission_ids))).scalar()
+
+def test_submissions_are_committed_in_one_group(client, group_sizes):
+    plan, table = registry.get_plan(TEMPLATE), get_dynamic_table(TEMPLATE)
+    rows = [_row() for _ in range(5)]
+
+    async def submit_all():
+        queue = WriteBehindQueue(capacity=10, max_batch=10, max_delay=0.05)
+        queue.start()
+        await asyncio.gather(*(queue.submit(plan, table, row) for row in rows))
+        await queue.drain()
+        return queue.stats()
+
+    stats = asyncio.run(submit_all())
+    assert group_sizes == [5]
+    assert stats["accepted"] == 5 and stats["groups_committed"] == 1
+    assert _count(table, [row["submission_id"] for row in rows]) == 5
+
+def test_drain_commits_every_accepted_submission(client, group_sizes):
+    plan, table = registry.get_plan(TEMPLATE), get_dynamic_table(TEMPLATE)
+    rows = [_row() for _ in range(7)]
+
+    async def submit_then_drain():
+        queue = WriteBehindQueue(capacity=10, max_batch=3, max_delay=1.0)
+        queue.start()
+        submissions = [asyncio.create_task(queue.submit(plan, table, row)) for row in rows]
+        # Let every submission reach the queue, well before the flusher's delay is up
+        await asyncio.sleep(0)
+        assert queue.stats()["accepted"] == 7
+        await queue.drain()
+        assert all(submission.done() and submission.exception() is None for submission in submissions)
+        with pytest.raises(WriteBehindFull):
+            await queue.submit(plan, table, _row())
+
+    asyncio.run(submit_then_drain())
+    assert sum(group_sizes) == 7 and max(group_sizes) <= 3
+    assert _count(table, [row["submission_id"] for row in rows]) == 7
+
+def test_full_queue_rejects_submissions_with_429(client, monkeypatch):
+    queue = WriteBehindQueue(capacity=1, max_batch=1, max_delay=0)
+    release = threading.Event()
+    run_in_transaction = app.write_behind.run_in_transaction
+
+    async def blocked(fn, table, group):
+        # Hold the first group so the next submission waits in the queue
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        return await run_in_transaction(fn, table, group)
+
+    monkeypatch.setattr(app.write_behind, "run_in_transaction", blocked)
+    monkeypatch.setattr(app.endpoints, "write_behind", queue)
+    client.portal.call(queue.start)
+
+    def post():
+        responses.append(client.post(f"/forms/{TEMPLATE}", json={"text-input-1": {"value": "queued"}}))
+
+    responses = []
+    pending = [threading.Thread(target=post) for _ in range(2)]
+    # The first submission is taken by the flusher, the second fills the queue
+    for accepted, thread in enumerate(pending, start=1):
+        thread.start()
+        while (queue.stats()["accepted"], queue.stats()["depth"]) != (accepted, accepted - 1):
+            time.sleep(0.01)
+
+    rejected = client.post(f"/forms/{TEMPLATE}", json={"text-input-1": {"value": "rejected"}})
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "1"
+    assert queue.stats()["rejected"] == 1
+
+    release.set()
+    for thread in pending:
+        thread.join()
+    client.portal.call(queue.drain)
+    assert [response.status_code for response in responses] == [200, 200]